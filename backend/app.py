@@ -1,14 +1,29 @@
 import os
 import sys
+import time
+import copy
+import hashlib
+import threading
+import queue
+import logging
+import tempfile
+import numpy as np
 import pandas as pd
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from pymongo.errors import DuplicateKeyError
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
+import re
 import base64
 from io import BytesIO
+from collections import defaultdict, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
 
 # MongoDB Database
 from database import (
@@ -16,6 +31,8 @@ from database import (
     get_user_by_email,
     create_user,
     get_user_by_id,
+    get_users_by_ids,
+    to_object_id,
     create_order,
     get_orders_by_user,
     get_order_by_id,
@@ -34,7 +51,22 @@ from database import (
     mark_notification_read,
     mark_all_notifications_read,
     get_unread_count,
-    notify_doctors
+    notify_doctors,
+    invalidate_doctor_recipients,
+    next_sequence,
+    hash_password,
+    is_password_hash,
+    verify_password,
+    decode_certificate,
+    store_license_certificate,
+    delete_license_certificate,
+    open_license_certificate,
+    get_cached_usages,
+    cache_usages,
+    create_ocr_job,
+    finish_ocr_job,
+    get_ocr_job,
+    fail_stale_ocr_job
 )
 
 # Fix Windows console encoding for Unicode characters
@@ -45,7 +77,7 @@ if sys.platform == 'win32':
 # Tesseract OCR imports
 try:
     import pytesseract
-    from PIL import Image, ImageEnhance, ImageFilter
+    from PIL import Image, ImageFilter
     TESSERACT_AVAILABLE = True
     # Configure Tesseract path for Windows
     if os.name == 'nt':  # Windows
@@ -63,11 +95,94 @@ except ImportError:
     TESSERACT_AVAILABLE = False
     print("⚠ Tesseract OCR not available - install pytesseract and Tesseract-OCR")
 
+# Pillow on its own is enough to fingerprint uploads for the near-duplicate OCR cache
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# tesserocr keeps the Tesseract engine and language model loaded in-process, instead of
+# pytesseract starting a new tesseract process (and reloading the model) for every image
+TESSEROCR_AVAILABLE = False
+_TESSEROCR_ENGINES = queue.SimpleQueue()
+if TESSERACT_AVAILABLE:
+    try:
+        import tesserocr
+        # Create the first engine now so a missing language model is reported at startup
+        _TESSEROCR_ENGINES.put(tesserocr.PyTessBaseAPI(lang='eng', oem=tesserocr.OEM.DEFAULT))
+        TESSEROCR_AVAILABLE = True
+        print("✓ tesserocr engine loaded")
+    except ImportError:
+        pass
+    except RuntimeError as e:
+        print(f"⚠ tesserocr could not start, using pytesseract: {e}")
+
+# orjson parses JSON several times faster than the stdlib json module
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+def parse_json(text):
+    """Parse JSON text or bytes, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(text)
+    return json.loads(text)
+
+def dump_json(obj, indent=False):
+    """Serialize obj to a JSON string (non-ASCII kept as-is), using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None).decode()
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None)
+
+# xxHash is much faster than blake2b for the large prompt/image strings used as cache keys
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+# PyArrow lets pandas keep the dataset's strings in contiguous Arrow buffers and run
+# string searches in C++ instead of over per-cell Python objects
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 # Load environment variables
 load_dotenv()
 
+# Per-request tracing goes through logging so it costs nothing unless LOG_LEVEL=DEBUG
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'))
+logger = logging.getLogger(__name__)
+
 # Initialize Flask app
 app = Flask(__name__)
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes and decodes with orjson"""
+    
+    # Datetimes go through Flask's default hook so responses keep the same date format
+    OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if ORJSON_AVAILABLE else 0
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.OPTIONS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        """Build a jsonify() response from orjson's bytes, skipping the str decode/re-encode"""
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self.OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
+
 CORS(app, resources={r"/api/*": {"origins": "*", "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"], "allow_headers": ["Content-Type", "Authorization"]}}, supports_credentials=True)
 
 # SMS Configuration - Using Twilio
@@ -92,25 +207,43 @@ if SMS_ENABLED:
         print("⚠ Twilio package not installed. Install with: pip install twilio")
         SMS_ENABLED = False
 
+# Notifications and SMS are best-effort, so they run on a background pool instead of
+# holding the request thread for the Twilio round trips
+_NOTIFY_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix='notify')
+
+def _log_background_failure(future):
+    """Log exceptions from background notification tasks, which would otherwise be dropped"""
+    if future.exception() is not None:
+        logger.error("Background notification task failed", exc_info=future.exception())
+
+def run_in_background(fn, *args, **kwargs):
+    """Run fn on the notification pool without waiting for it"""
+    future = _NOTIFY_EXECUTOR.submit(fn, *args, **kwargs)
+    future.add_done_callback(_log_background_failure)
+    return future
+
+# Whitespace and dashes users type into phone numbers
+_PHONE_STRIP_RE = re.compile(r'[\s\-]')
+
 def send_sms(phone_number, message):
     """Send SMS using Twilio"""
     if not SMS_ENABLED or not twilio_client:
-        print(f"📱 SMS disabled - Would send to {phone_number}: {message}")
+        logger.debug("SMS disabled, not sending %d-character message", len(message))
         return False
     
     try:
         # Clean phone number
-        phone = phone_number.strip().replace(' ', '').replace('-', '')
+        phone = _PHONE_STRIP_RE.sub('', phone_number)
         
         # Ensure phone has country code
-        if phone.startswith('+91'):
-            phone = phone  # Keep as is
-        elif phone.startswith('91') and len(phone) == 12:
+        if phone.startswith('+'):
+            pass  # Already international
+        elif len(phone) == 12 and phone.startswith('91'):
             phone = '+' + phone
         elif len(phone) == 10:
             phone = '+91' + phone  # Assume Indian number
         
-        print(f"📱 Sending SMS via Twilio to {phone}...")
+        logger.debug("Sending SMS via Twilio")
         
         message_obj = twilio_client.messages.create(
             body=message,
@@ -118,13 +251,11 @@ def send_sms(phone_number, message):
             to=phone
         )
         
-        print(f"✓ SMS sent successfully to {phone}")
-        print(f"  Message SID: {message_obj.sid}")
-        print(f"  Status: {message_obj.status}")
+        logger.debug("SMS sent (SID %s, status %s)", message_obj.sid, message_obj.status)
         return True
             
     except Exception as e:
-        print(f"✗ SMS error: {e}")
+        logger.warning("SMS error: %s", e)
         return False
 
 def notify_doctors_with_sms(notification_data, message_text=None):
@@ -134,18 +265,43 @@ def notify_doctors_with_sms(notification_data, message_text=None):
     
     # Send SMS to doctors with phone numbers
     if SMS_ENABLED and twilio_client:
-        doctors = list(db.db.users.find({"type": "doctor"}))
+        # Only pull the phone fields; served by the users.type index
+        doctors = db.users.find(
+            {"type": "doctor", "$or": [{"phone": {"$exists": True}}, {"phoneNumber": {"$exists": True}}]},
+            {"phone": 1, "phoneNumber": 1, "_id": 0}
+        )
         sms_message = message_text or notification_data.get('message', 'New notification from HealthCare App')
+        # Twilio supports up to 1600 chars, but keep it short for readability
+        short_message = sms_message[:300] + '...' if len(sms_message) > 300 else sms_message
         
-        for doctor in doctors:
-            phone = doctor.get('phone') or doctor.get('phoneNumber')
+        phones = [doctor.get('phone') or doctor.get('phoneNumber') for doctor in doctors]
+        for phone in phones:
             if phone:
-                # Twilio supports up to 1600 chars, but keep it short for readability
-                short_message = sms_message[:300] + '...' if len(sms_message) > 300 else sms_message
-                send_sms(phone, short_message)
+                run_in_background(send_sms, phone, short_message)
     
     return notifications
 
+_STARTUP_LOCK = None
+
+def _startup_once():
+    """Seed demo users from a single process even when several Gunicorn workers import the app"""
+    global _STARTUP_LOCK
+    try:
+        import fcntl
+    except ImportError:
+        # No fcntl on Windows, where only the single-process dev server is used
+        initialize_demo_users()
+        return
+    
+    # The lock is held for the life of the worker, so later workers skip seeding
+    _STARTUP_LOCK = open(os.path.join(tempfile.gettempdir(), 'healthcare_backend_startup.lock'), 'w')
+    try:
+        fcntl.flock(_STARTUP_LOCK, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        print("  Demo users are handled by another worker")
+        return
+    initialize_demo_users()
+
 # Connect to MongoDB
 print("\n" + "="*50)
 print("🔌 Connecting to MongoDB...")
@@ -153,7 +309,7 @@ print("="*50)
 db.connect()
 if db.is_connected():
     print("✓ Initializing demo users...")
-    initialize_demo_users()
+    _startup_once()
 print("="*50 + "\n")
 
 # Configure Gemini AI - Using REST API directly (more reliable than SDK)
@@ -173,16 +329,119 @@ MODELS_TO_TRY = [
 ]
 PRIMARY_MODEL = "gemini-2.0-flash"  # Most reliable current model
 
-def call_gemini_api(prompt):
-    """Call Gemini API using REST endpoint directly"""
+# Models that just failed are skipped for a while instead of being retried first on every call
+MODEL_RETRY_AFTER_SECONDS = 60
+_ACTIVE_MODEL = PRIMARY_MODEL
+_MODEL_BLACKLIST = {}  # model name -> monotonic time after which it may be retried
+
+def _models_to_attempt():
+    """Order models for a call: last working model first, then fallbacks not cooling down"""
+    now = time.monotonic()
+    candidates = [_ACTIVE_MODEL] + [m for m in MODELS_TO_TRY if m != _ACTIVE_MODEL]
+    available = [m for m in candidates if _MODEL_BLACKLIST.get(m, 0) <= now]
+    # If everything is cooling down, still try them all rather than failing outright
+    return available or candidates
+
+# Shared HTTP session so Gemini calls reuse warm keep-alive connections instead of
+# paying a new TCP + TLS handshake on every request. Every call goes to one host, so a
+# single pool sized to the worker's request threads (plus the translation executor) is
+# enough for all of them to have a Gemini call in flight at once
+GEMINI_POOL_SIZE = int(os.getenv('GEMINI_POOL_SIZE', int(os.getenv('GUNICORN_THREADS', 8)) + 4))
+# Pooled keep-alive connections can be closed by the server while idle, so retry failed
+# connects (nothing has been sent yet) with a short backoff. Error responses and read
+# timeouts are not retried here - the callers already fall back to the next model
+_GEMINI_RETRY = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2)
+_GEMINI_SESSION = requests.Session()
+_GEMINI_SESSION.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=GEMINI_POOL_SIZE,
+                                              max_retries=_GEMINI_RETRY))
+
+def _candidate_text(data):
+    """Extract the first candidate's text from a Gemini response body, or None"""
+    if 'candidates' in data and len(data['candidates']) > 0:
+        candidate = data['candidates'][0]
+        if 'content' in candidate and 'parts' in candidate['content']:
+            parts = candidate['content']['parts']
+            if len(parts) > 0 and 'text' in parts[0]:
+                return parts[0]['text']
+    return None
+
+class JsonObjectScanner:
+    """Find where the first complete top-level JSON object ends in text that arrives in pieces
+    
+    The brace depth and string/escape state carry over between feed() calls, so each piece
+    is scanned once however long the text grows.
+    """
+    
+    def __init__(self):
+        self.offset = 0  # Characters fed so far
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+    
+    def feed(self, text):
+        """Scan the next piece; return the index (in all text fed so far) just past the object, or -1"""
+        depth, in_string, escaped = self.depth, self.in_string, self.escaped
+        for i, ch in enumerate(text):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif depth == 0:
+                # Text before the object (e.g. a code fence) is skipped, quotes included
+                if ch == '{':
+                    depth = 1
+            elif ch == '"':
+                in_string = True
+            elif ch == '{':
+                depth += 1
+            elif ch == '}':
+                depth -= 1
+                if depth == 0:
+                    return self.offset + i + 1
+        self.depth, self.in_string, self.escaped = depth, in_string, escaped
+        self.offset += len(text)
+        return -1
+
+def _read_streamed_json(response):
+    """Accumulate text from a streamGenerateContent SSE response, stopping as soon as
+    a complete top-level JSON object has arrived"""
+    chunks = []
+    scanner = JsonObjectScanner()
+    try:
+        for line in response.iter_lines():
+            if not line.startswith(b'data:'):
+                continue
+            text = _candidate_text(parse_json(line[5:]))
+            if not text:
+                continue
+            chunks.append(text)
+            end = scanner.feed(text)
+            if end != -1:
+                return ''.join(chunks)[:end]
+    finally:
+        # Closing early drops the remaining tokens instead of waiting for them
+        response.close()
+    return ''.join(chunks)
+
+def call_gemini_api(prompt, stop_at_json=False):
+    """Call Gemini API using REST endpoint directly
+    
+    With stop_at_json=True the response is streamed and returned as soon as a
+    complete JSON object has been received.
+    """
+    global _ACTIVE_MODEL
     if not GEMINI_API_KEY:
         raise Exception("GEMINI_API_KEY not configured")
     
     last_error = None
+    method = "streamGenerateContent?alt=sse&" if stop_at_json else "generateContent?"
     
     # Try each model until one works
-    for model_name in [PRIMARY_MODEL] + MODELS_TO_TRY:
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={GEMINI_API_KEY}"
+    for model_name in _models_to_attempt():
+        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:{method}key={GEMINI_API_KEY}"
         
         payload = {
             "contents": [{
@@ -202,38 +461,41 @@ def call_gemini_api(prompt):
             "Content-Type": "application/json"
         }
         
-        print(f"Calling Gemini API ({model_name})...")
+        logger.debug("Calling Gemini API (%s)...", model_name)
         try:
-            response = requests.post(url, json=payload, headers=headers, timeout=60)
+            response = _GEMINI_SESSION.post(url, json=payload, headers=headers, timeout=60, stream=stop_at_json)
             
-            print(f"API Response Status: {response.status_code}")
+            logger.debug("API Response Status: %s", response.status_code)
             
             if response.status_code == 200:
-                data = response.json()
-                
                 # Extract text from response
-                if 'candidates' in data and len(data['candidates']) > 0:
-                    candidate = data['candidates'][0]
-                    if 'content' in candidate and 'parts' in candidate['content']:
-                        parts = candidate['content']['parts']
-                        if len(parts) > 0 and 'text' in parts[0]:
-                            print(f"SUCCESS with {model_name}!")
-                            return parts[0]['text']
+                if stop_at_json:
+                    text = _read_streamed_json(response)
+                else:
+                    text = _candidate_text(response.json())
+                if text:
+                    logger.debug("SUCCESS with %s!", model_name)
+                    _ACTIVE_MODEL = model_name
+                    _MODEL_BLACKLIST.pop(model_name, None)
+                    return text
+                last_error = f"Status {response.status_code}: no text in response"
+            else:
+                error_data = response.json() if response.text else {}
+                last_error = error_data.get('error', {}).get('message', f"Status {response.status_code}")
             
             # If we got here, try next model
-            error_data = response.json() if response.text else {}
-            last_error = error_data.get('error', {}).get('message', f"Status {response.status_code}")
-            print(f"Model {model_name} failed: {last_error[:100]}...")
+            logger.warning("Model %s failed: %.100s...", model_name, last_error)
             
         except Exception as e:
             last_error = str(e)
-            print(f"Model {model_name} error: {e}")
-            continue
+            logger.warning("Model %s error: %s", model_name, e)
+        
+        _MODEL_BLACKLIST[model_name] = time.monotonic() + MODEL_RETRY_AFTER_SECONDS
     
     raise Exception(f"All models failed. Last error: {last_error}")
 
 def call_gemini_vision_api(prompt, image_base64, mime_type="image/jpeg"):
-    """Call Gemini Vision API to analyze images"""
+    """Call Gemini Vision API to analyze an image given as a base64 string or raw bytes"""
     if not GEMINI_API_KEY:
         raise Exception("GEMINI_API_KEY not configured")
     
@@ -246,35 +508,47 @@ def call_gemini_vision_api(prompt, image_base64, mime_type="image/jpeg"):
     ]
     last_error = None
     
-    for model_name in vision_models:
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={GEMINI_API_KEY}"
-        
-        payload = {
-            "contents": [{
-                "parts": [
-                    {"text": prompt},
-                    {
-                        "inline_data": {
-                            "mime_type": mime_type,
-                            "data": image_base64
-                        }
+    # Raw image bytes are base64-encoded here, once, at the API boundary
+    if isinstance(image_base64, (bytes, bytearray)):
+        image_base64 = base64.b64encode(image_base64).decode('ascii')
+    
+    cache_key = _vision_cache_key(prompt, image_base64, mime_type)
+    cached = _VISION_CACHE.get(cache_key)
+    if cached is not None:
+        logger.debug("Returning cached vision result")
+        return cached
+    
+    # The request body is identical for every model, so serialize the (large) image
+    # payload once instead of re-encoding it on each fallback attempt
+    payload = {
+        "contents": [{
+            "parts": [
+                {"text": prompt},
+                {
+                    "inline_data": {
+                        "mime_type": mime_type,
+                        "data": image_base64
                     }
-                ]
-            }],
-            "generationConfig": {
-                "temperature": 0.3,
-                "topP": 0.95,
-                "topK": 40,
-                "maxOutputTokens": 1024,
-            }
+                }
+            ]
+        }],
+        "generationConfig": {
+            "temperature": 0.3,
+            "topP": 0.95,
+            "topK": 40,
+            "maxOutputTokens": 1024,
         }
+    }
+    body = orjson.dumps(payload) if ORJSON_AVAILABLE else dump_json(payload).encode('utf-8')
+    headers = {"Content-Type": "application/json"}
+    
+    for model_name in vision_models:
+        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={GEMINI_API_KEY}"
         
-        headers = {"Content-Type": "application/json"}
-        
-        print(f"Calling Gemini Vision API ({model_name})...")
+        logger.debug("Calling Gemini Vision API (%s)...", model_name)
         try:
-            response = requests.post(url, json=payload, headers=headers, timeout=60)
-            print(f"Vision API Response Status: {response.status_code}")
+            response = _GEMINI_SESSION.post(url, data=body, headers=headers, timeout=60)
+            logger.debug("Vision API Response Status: %s", response.status_code)
             
             if response.status_code == 200:
                 data = response.json()
@@ -283,16 +557,17 @@ def call_gemini_vision_api(prompt, image_base64, mime_type="image/jpeg"):
                     if 'content' in candidate and 'parts' in candidate['content']:
                         parts = candidate['content']['parts']
                         if len(parts) > 0 and 'text' in parts[0]:
-                            print(f"Vision SUCCESS with {model_name}!")
+                            logger.debug("Vision SUCCESS with %s!", model_name)
+                            _VISION_CACHE.put(cache_key, parts[0]['text'])
                             return parts[0]['text']
             
             error_data = response.json() if response.text else {}
             last_error = error_data.get('error', {}).get('message', f"Status {response.status_code}")
-            print(f"Vision model {model_name} failed: {last_error[:100]}...")
+            logger.warning("Vision model %s failed: %.100s...", model_name, last_error)
             
         except Exception as e:
             last_error = str(e)
-            print(f"Vision model {model_name} error: {e}")
+            logger.warning("Vision model %s error: %s", model_name, e)
             continue
     
     raise Exception(f"All vision models failed. Last error: {last_error}")
@@ -300,9 +575,120 @@ def call_gemini_vision_api(prompt, image_base64, mime_type="image/jpeg"):
 print(f"✓ Gemini REST API configured (primary model: {PRIMARY_MODEL})")
 
 # Load medicine dataset
+def _parse_price(price_str):
+    """Parse price from string like '₹335.68'"""
+    try:
+        return float(price_str.replace('₹', '').replace(',', '').strip())
+    except (AttributeError, ValueError):
+        return 50.0
+
+def build_medicine_records(data):
+    """Parse every dataset row (already filled by load_medicine_data) once into the dicts returned by the medicine endpoints"""
+    records = []
+    details = []
+    columns = ['med_name', 'generic_name', 'disease_name', 'final_price', 'drug_manufacturer',
+               'prescription_required', 'img_urls', 'drug_content', 'drug_varient']
+    rows = data[columns].itertuples(index=False, name=None)
+    for idx, (name, generic, disease, price, manufacturer, rx, img_urls, content, variant) in enumerate(rows):
+        # Generic names, diseases and manufacturers repeat across thousands of rows,
+        # so intern them to share one string object per distinct value
+        generic = sys.intern(generic)
+        disease = sys.intern(disease)
+        
+        records.append({
+            'id': idx,
+            'name': name,
+            'generic_name': generic,
+            'disease': disease,
+            'composition': generic,
+            'uses': disease or 'General use medicine',
+            'sideEffects': 'Consult doctor for side effects information',
+            'manufacturer': sys.intern(manufacturer.replace('* Mkt:', '').strip()),
+            'prescription_required': rx == 'Rx required',
+            'available': True,
+            'price': _parse_price(price),
+            'image_url': img_urls.split(',')[0]
+        })
+        
+        # Get drug content for detailed info (truncated)
+        if len(content) > 500:
+            content = content[:500] + '...'
+        details.append({
+            'description': content,
+            'drug_variant': variant
+        })
+    
+    return records, details
+
+_TOKEN_RE = re.compile(r'\w+')
+_EMPTY_POSTINGS = np.empty(0, dtype=np.int32)
+
+def build_search_index(haystack):
+    """Build token, trigram and bigram inverted indexes (term -> sorted row indices) over the search text"""
+    token_index = defaultdict(list)
+    trigram_index = defaultdict(list)
+    bigram_index = defaultdict(list)
+    for idx, text in enumerate(haystack):
+        for token in set(_TOKEN_RE.findall(text)):
+            token_index[token].append(idx)
+        for trigram in {text[i:i + 3] for i in range(len(text) - 2)}:
+            trigram_index[trigram].append(idx)
+        for bigram in {text[i:i + 2] for i in range(len(text) - 1)}:
+            bigram_index[bigram].append(idx)
+    
+    # Rows are visited in order, so every postings list is already sorted
+    token_index = {k: np.array(v, dtype=np.int32) for k, v in token_index.items()}
+    trigram_index = {k: np.array(v, dtype=np.int32) for k, v in trigram_index.items()}
+    bigram_index = {k: np.array(v, dtype=np.int32) for k, v in bigram_index.items()}
+    return token_index, trigram_index, bigram_index
+
+# Only the columns the API uses; reading everything as str skips type inference
+MEDICINE_COLUMNS = ['med_name', 'generic_name', 'disease_name', 'final_price', 'drug_manufacturer',
+                    'prescription_required', 'img_urls', 'drug_varient', 'drug_content']
+
+# Defaults for missing cells, filled once at load so row accessors never need NaN checks
+MEDICINE_FILL_VALUES = {
+    'med_name': '', 'generic_name': '', 'disease_name': '', 'final_price': '₹50.0',
+    'drug_manufacturer': 'Unknown', 'prescription_required': '', 'img_urls': '',
+    'drug_varient': '', 'drug_content': ''
+}
+
+def load_medicine_data(csv_path='medicines.csv'):
+    """Load the medicine dataset, reusing a pickled copy when it is newer than the CSV"""
+    cache_path = os.path.splitext(csv_path)[0] + '.cache.pkl'
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(csv_path):
+        return pd.read_pickle(cache_path).fillna(MEDICINE_FILL_VALUES)
+    
+    if PYARROW_AVAILABLE:
+        data = pd.read_csv(csv_path, usecols=MEDICINE_COLUMNS, dtype='string[pyarrow]',
+                           engine='pyarrow', dtype_backend='pyarrow')
+    else:
+        data = pd.read_csv(csv_path, usecols=MEDICINE_COLUMNS, dtype=str, engine='c')
+    data = data.fillna(MEDICINE_FILL_VALUES)
+    try:
+        data.to_pickle(cache_path)
+    except OSError as e:
+        print(f"  Could not write dataset cache: {e}")
+    return data
+
 MEDICINE_DATA = None
+_SEARCH_HAYSTACK = None
+_TOKEN_INDEX = {}
+_TRIGRAM_INDEX = {}
+_BIGRAM_INDEX = {}
+_MEDICINE_RECORDS = []
+_MEDICINE_DETAILS = []
 try:
-    MEDICINE_DATA = pd.read_csv('medicines.csv')
+    MEDICINE_DATA = load_medicine_data()
+    # The dataset is never mutated, so lowercase the searchable columns once into a
+    # single "name|generic|disease" column and scan that instead of three columns per query
+    _SEARCH_HAYSTACK = (
+        MEDICINE_DATA['med_name'] + '|' +
+        MEDICINE_DATA['generic_name'] + '|' +
+        MEDICINE_DATA['disease_name']
+    ).str.lower().reset_index(drop=True)
+    _MEDICINE_RECORDS, _MEDICINE_DETAILS = build_medicine_records(MEDICINE_DATA)
+    _TOKEN_INDEX, _TRIGRAM_INDEX, _BIGRAM_INDEX = build_search_index(_SEARCH_HAYSTACK)
     print(f"✓ Loaded {len(MEDICINE_DATA)} medicines from dataset")
     print(f"  Columns: {MEDICINE_DATA.columns.tolist()}")
 except Exception as e:
@@ -310,19 +696,154 @@ except Exception as e:
 
 # ==================== HELPER FUNCTIONS ====================
 
-def translate_medical_response(response_dict, target_language):
-    """Translate medical response fields to target language using Gemini"""
+class LRUCache:
+    """Small thread-safe LRU cache that hands out deep copies so callers can't mutate entries
+    
+    With copy_values=False values are stored and returned as-is; callers must only cache
+    values nothing will mutate (e.g. read-only numpy arrays).
+    """
+    
+    def __init__(self, max_entries, ttl_seconds=None, copy_values=True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.copy_values = copy_values
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Return a copy of the cached value, or None on a miss or an expired entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return copy.deepcopy(value) if self.copy_values else value
+    
+    def put(self, key, value):
+        """Store a copy of value, evicting the least recently used entry when full"""
+        if self.copy_values:
+            value = copy.deepcopy(value)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+# Matches from the first { to the last } (or [ to ]) of a model response
+_JSON_BLOCK_RE = re.compile(r'\{.*\}', re.DOTALL)
+_JSON_ARRAY_RE = re.compile(r'\[.*\]', re.DOTALL)
+# Captures a model response without its optional ```json ... ``` markdown fence
+_JSON_FENCE_RE = re.compile(r'^\s*(?:```(?:json)?)?\s*(.*?)\s*(?:```)?\s*$', re.DOTALL | re.IGNORECASE)
+
+def strip_json_fence(text):
+    """Remove a surrounding markdown code fence (and whitespace) from a model response"""
+    return _JSON_FENCE_RE.match(text).group(1)
+
+# Upper bound on how long a request waits for its (possibly batched) translation
+TRANSLATION_TIMEOUT_SECONDS = 120
+
+# Identical symptom descriptions are common, so reuse recent AI analyses
+_AI_CACHE = LRUCache(max_entries=1024)
+
+def _cache_digest(data):
+    """128-bit integer digest of data (bytes), so cache dicts hash a small int instead of a long string"""
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh3_128_intdigest(data)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=16).digest(), 'little')
+
+def _ai_cache_key(symptoms, follow_up_answers, language):
+    """Digest of the analysis inputs used as the symptom cache key"""
+    raw = f"{symptoms}|{follow_up_answers}|{language}"
+    return _cache_digest(raw.encode())
+
+# Users often re-submit the same prescription/label image, so reuse recent vision results
+_VISION_CACHE = LRUCache(max_entries=256)
+
+def _vision_cache_key(prompt, image_base64, mime_type):
+    """Digest of the image content and prompt used as the vision cache key"""
+    return (_cache_digest(image_base64.encode('ascii')), _cache_digest(f"{mime_type}|{prompt}".encode()))
+
+# Whole OCR endpoint responses for recently uploaded images, so a re-submitted photo skips
+# Gemini/Tesseract entirely; entries expire so a transient bad read isn't served for long
+OCR_CACHE_TTL_SECONDS = 600
+_OCR_CACHE = LRUCache(max_entries=1024, ttl_seconds=OCR_CACHE_TTL_SECONDS)
+
+def _ocr_cache_key(kind, base64_data):
+    """Digest of the uploaded image used as the OCR response cache key"""
+    return (kind, _cache_digest(base64_data.encode('ascii', 'ignore')))
+
+class ImageHashCache:
+    """Thread-safe cache of recent results keyed by 64-bit perceptual image hashes
+
+    A lookup hits any entry whose hash is within max_distance bits of the query, so
+    re-shoots and re-crops of the same package find each other.
+    """
+    
+    def __init__(self, max_entries, max_distance, ttl_seconds):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, image_hash):
+        """Return a copy of the result for the closest unexpired similar image, or None"""
+        now = time.monotonic()
+        best = None
+        with self._lock:
+            for stored_hash, (expires_at, value) in self._entries.items():
+                distance = bin(stored_hash ^ image_hash).count('1')
+                if distance <= self.max_distance and expires_at > now and (best is None or distance < best[0]):
+                    best = (distance, value)
+        return copy.deepcopy(best[1]) if best else None
+    
+    def put(self, image_hash, value):
+        """Store a copy of value, evicting the oldest entry when full"""
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[image_hash] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(image_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+# Medicine label results by perceptual hash, for photos that differ slightly from a recent one
+MAX_IMAGE_HASH_DISTANCE = 5
+_LABEL_HASH_CACHE = ImageHashCache(max_entries=1024, max_distance=MAX_IMAGE_HASH_DISTANCE,
+                                   ttl_seconds=OCR_CACHE_TTL_SECONDS)
+
+def image_dhash(base64_data):
+    """64-bit difference hash of an uploaded image, or None if Pillow can't read it"""
+    if not PIL_AVAILABLE:
+        return None
     try:
-        # Build translation prompt
-        translate_prompt = f"""Translate the following medical text from English to {target_language}.
+        image = Image.open(BytesIO(base64.b64decode(base64_data)))
+        # Only a 9x8 thumbnail is needed, so let the JPEG decoder downscale as far as it can
+        image.draft('L', (64, 64))
+        pixels = list(image.convert('L').resize((9, 8), Image.Resampling.BILINEAR).getdata())
+    except Exception as e:
+        logger.debug("Could not hash image: %s", e)
+        return None
+    image_hash = 0
+    for row in range(8):
+        for col in range(8):
+            image_hash = (image_hash << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return image_hash
+
+# Translation prompts, filled in with str.format so the text is only assembled once per call
+_TRANSLATE_PROMPT_TEMPLATE = """Translate the following medical text from English to {language}.
 Keep the translation natural, clear, and medically accurate.
 
 IMPORTANT: Return ONLY valid JSON with translated text. Medicine names should remain in English.
 
 English JSON:
-{json.dumps(response_dict, ensure_ascii=False, indent=2)}
+{payload}
 
-Translate these fields to {target_language}:
+Translate these fields to {language}:
 - followUpQuestions (array of questions)
 - analysis (medical explanation)
 - recommendations (array of recommendations)
@@ -333,128 +854,250 @@ Keep these fields unchanged:
 - doctorConsultation
 - urgencyLevel
 
-Return the complete JSON with translated fields in {target_language}."""
+Return the complete JSON with translated fields in {language}."""
 
-        translated_text = call_gemini_api(translate_prompt)
-        
-        # Extract JSON from response
-        translated_text = translated_text.strip()
-        if '```' in translated_text:
-            translated_text = translated_text.replace('```json', '').replace('```', '').strip()
-        
-        first_brace = translated_text.find('{')
-        last_brace = translated_text.rfind('}')
-        if first_brace != -1 and last_brace != -1:
-            translated_text = translated_text[first_brace:last_brace + 1]
-        
-        translated_result = json.loads(translated_text)
-        print(f"✓ Successfully translated to {target_language}")
-        return translated_result
-        
+_TRANSLATE_BATCH_PROMPT_TEMPLATE = """Translate each JSON object in the following list from English to {language}.
+Keep the translation natural, clear, and medically accurate.
+
+IMPORTANT: Return ONLY a valid JSON array containing exactly {count} translated objects, in the same order. Medicine names should remain in English.
+
+English JSON list:
+{payload}
+
+In every object, translate these fields to {language}:
+- followUpQuestions (array of questions)
+- analysis (medical explanation)
+- recommendations (array of recommendations)
+
+Keep these fields unchanged:
+- severity
+- suggestedMedicines (medicine names stay in English)
+- doctorConsultation
+- urgencyLevel
+
+Return the complete JSON array with translated fields in {language}."""
+
+def _translate_single(response_dict, target_language):
+    """Translate one medical response with its own Gemini call"""
+    translate_prompt = _TRANSLATE_PROMPT_TEMPLATE.format(
+        language=target_language, payload=dump_json(response_dict, indent=True))
+
+    translated_text = call_gemini_api(translate_prompt)
+    
+    # Extract JSON from response
+    match = _JSON_BLOCK_RE.search(translated_text)
+    return parse_json(match.group(0) if match else translated_text)
+
+def _translate_many(response_dicts, target_language):
+    """Translate several medical responses to the same language with one Gemini call"""
+    translate_prompt = _TRANSLATE_BATCH_PROMPT_TEMPLATE.format(
+        language=target_language, count=len(response_dicts), payload=dump_json(response_dicts, indent=True))
+
+    translated_text = call_gemini_api(translate_prompt)
+    
+    match = _JSON_ARRAY_RE.search(translated_text)
+    translated = parse_json(match.group(0) if match else translated_text)
+    if not isinstance(translated, list) or len(translated) != len(response_dicts):
+        raise ValueError(f"Expected {len(response_dicts)} translations, got {len(translated) if isinstance(translated, list) else 'none'}")
+    return translated
+
+class TranslationBatcher:
+    """Coalesces translations requested at about the same time into one Gemini call per language
+    
+    Requests are collected for up to window_seconds (or until max_batch arrive), so N concurrent
+    translations cost roughly one Gemini round trip instead of N.
+    """
+    
+    def __init__(self, window_seconds=0.05, max_batch=8):
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self._pending = []  # (response_dict, language, future)
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='translate')
+        threading.Thread(target=self._dispatch_forever, name='translate-batcher', daemon=True).start()
+    
+    def submit(self, response_dict, target_language):
+        """Queue a translation and return a Future for the translated dict"""
+        future = Future()
+        with self._cond:
+            self._pending.append((response_dict, target_language, future))
+            self._cond.notify()
+        return future
+    
+    def _dispatch_forever(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.window_seconds
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                self._pending = self._pending[self.max_batch:]
+            
+            by_language = defaultdict(list)
+            for item in batch:
+                by_language[item[1]].append(item)
+            for language, items in by_language.items():
+                self._executor.submit(self._translate_batch, language, items)
+    
+    def _translate_batch(self, language, items):
+        dicts = [item[0] for item in items]
+        try:
+            if len(dicts) == 1:
+                results = [_translate_single(dicts[0], language)]
+            else:
+                results = _translate_many(dicts, language)
+            logger.debug("Successfully translated %d response(s) to %s", len(dicts), language)
+        except Exception as e:
+            if len(dicts) > 1:
+                # A malformed batch reply shouldn't fail everyone - retry each on its own
+                logger.warning("Batch translation error: %s, retrying individually", e)
+                for item in items:
+                    self._translate_batch(language, [item])
+                return
+            logger.warning("Translation error: %s", e)
+            # Return original if translation fails
+            results = dicts
+        
+        for (_, _, future), result in zip(items, results):
+            future.set_result(result)
+
+_TRANSLATION_BATCHER = TranslationBatcher()
+
+def translate_medical_response(response_dict, target_language, while_waiting=None):
+    """Translate medical response fields to target language using Gemini
+    
+    while_waiting, if given, is called while the translation is in flight.
+    """
+    translation = _TRANSLATION_BATCHER.submit(response_dict, target_language)
+    if while_waiting:
+        while_waiting()
+    try:
+        return translation.result(timeout=TRANSLATION_TIMEOUT_SECONDS)
     except Exception as e:
-        print(f"Translation error: {e}")
+        logger.warning("Translation error: %s", e)
         # Return original if translation fails
         return response_dict
 
-def search_medicines(query, limit=10):
-    """Search medicines from dataset"""
+def _haystack_contains(haystack, query_lower):
+    """Boolean mask of haystack rows containing query_lower as a literal substring"""
+    return haystack.str.contains(query_lower, regex=False).to_numpy(dtype=bool)
+
+# Single-character queries (typing the first letter into a search box) each match much of
+# the dataset; there are few distinct characters, so their scans are kept once computed
+MAX_CHAR_POSTINGS = 128
+_CHAR_POSTINGS = {}
+
+def match_medicine_indices(query_lower):
+    """Return sorted row indices whose name, generic name or disease contains query_lower"""
+    if len(query_lower) == 2:
+        # A two-character substring is exactly a bigram, so its postings are the answer
+        return _BIGRAM_INDEX.get(query_lower, _EMPTY_POSTINGS)
+    
+    if len(query_lower) < 2:
+        # Too short for the n-gram indexes - scan the haystack, once per character
+        postings = _CHAR_POSTINGS.get(query_lower)
+        if postings is None:
+            postings = np.flatnonzero(_haystack_contains(_SEARCH_HAYSTACK, query_lower))
+            if len(_CHAR_POSTINGS) < MAX_CHAR_POSTINGS:
+                _CHAR_POSTINGS[query_lower] = postings
+        return postings
+    
+    # Trigrams only narrow the candidates, confirm the full substring
+    candidates = _trigram_candidates(query_lower)
+    if len(candidates) == 0:
+        return candidates
+    return candidates[_haystack_contains(_SEARCH_HAYSTACK.iloc[candidates], query_lower)]
+
+def _trigram_candidates(query_lower):
+    """Sorted rows containing every trigram of query_lower (3+ characters), before substring checks"""
+    trigrams = {query_lower[i:i + 3] for i in range(len(query_lower) - 2)}
+    # Intersect postings smallest-first so the candidate set shrinks quickly
+    postings = sorted((_TRIGRAM_INDEX.get(t, _EMPTY_POSTINGS) for t in trigrams), key=len)
+    candidates = postings[0]
+    for rows in postings[1:]:
+        if len(candidates) == 0:
+            break
+        candidates = np.intersect1d(candidates, rows, assume_unique=True)
+    return candidates
+
+def search_medicines(query, limit=10, fields=None):
+    """Search medicines from dataset, optionally returning only the given record fields"""
     if MEDICINE_DATA is None:
         return []
     
     query_lower = query.lower()
-    
-    # Search in medicine name and generic name
-    results = MEDICINE_DATA[
-        MEDICINE_DATA['med_name'].str.lower().str.contains(query_lower, na=False) |
-        MEDICINE_DATA['generic_name'].str.lower().str.contains(query_lower, na=False) |
-        MEDICINE_DATA['disease_name'].str.lower().str.contains(query_lower, na=False)
-    ].head(limit)
-    
-    medicines = []
-    for idx, row in results.iterrows():
-        # Parse price from string like '₹335.68'
-        price_str = str(row['final_price']) if pd.notna(row['final_price']) else '₹50.0'
-        try:
-            price = float(price_str.replace('₹', '').replace(',', '').strip())
-        except:
-            price = 50.0
-        
-        # Clean manufacturer string
-        manufacturer = str(row['drug_manufacturer']) if pd.notna(row['drug_manufacturer']) else 'Unknown'
-        manufacturer = manufacturer.replace('* Mkt:', '').strip()
-        
-        medicines.append({
-            'id': idx,
-            'name': str(row['med_name']) if pd.notna(row['med_name']) else '',
-            'generic_name': str(row['generic_name']) if pd.notna(row['generic_name']) else '',
-            'disease': str(row['disease_name']) if pd.notna(row['disease_name']) else '',
-            'composition': str(row['generic_name']) if pd.notna(row['generic_name']) else '',
-            'uses': str(row['disease_name']) if pd.notna(row['disease_name']) else 'General use medicine',
-            'sideEffects': 'Consult doctor for side effects information',
-            'manufacturer': manufacturer,
-            'prescription_required': str(row['prescription_required']) == 'Rx required' if pd.notna(row['prescription_required']) else False,
-            'available': True,
-            'price': price,
-            'image_url': str(row['img_urls']).split(',')[0] if pd.notna(row['img_urls']) else ''
-        })
-    
-    return medicines
+    return _ranked_records(query_lower, match_medicine_indices(query_lower), limit, fields)
+
+def _ranked_records(query_lower, matches, limit, fields):
+    """Records for the top matches of query_lower, ranked as search_medicines does"""
+    # Rank rows matching more of the query's whole words first, keeping dataset order otherwise
+    query_tokens = set(_TOKEN_RE.findall(query_lower))
+    if query_tokens and len(matches) > limit:
+        token_hits = np.zeros(len(matches), dtype=np.int32)
+        for token in query_tokens:
+            token_hits += np.isin(matches, _TOKEN_INDEX.get(token, _EMPTY_POSTINGS), assume_unique=True)
+        matches = matches[np.argsort(-token_hits, kind='stable')]
+    
+    if fields is None:
+        return [_MEDICINE_RECORDS[idx] for idx in matches[:limit]]
+    return [{field: _MEDICINE_RECORDS[idx][field] for field in fields} for idx in matches[:limit]]
+
+def search_medicine_names(names, limit=10, fields=None):
+    """Search for several names at once, returning {name: search_medicines(name, limit, fields)}
+
+    Each name's trigram candidates are gathered first, then the union of those rows is read
+    and checked against every name in a single pass instead of one haystack scan per name.
+    """
+    if MEDICINE_DATA is None:
+        return {name: [] for name in names}
+    
+    queries = {name.lower() for name in names}
+    matches = {}
+    candidates = {}
+    for query_lower in queries:
+        if len(query_lower) < 3:
+            # Served from the bigram index or the per-character cache without a scan
+            matches[query_lower] = match_medicine_indices(query_lower)
+        else:
+            candidates[query_lower] = _trigram_candidates(query_lower)
+    
+    if candidates:
+        union = np.unique(np.concatenate(list(candidates.values())))
+        texts = _SEARCH_HAYSTACK.iloc[union].tolist()
+        # Which names each union row is a candidate for, so each row is only checked against those
+        wanted = [(query_lower, np.isin(union, rows, assume_unique=True)) for query_lower, rows in candidates.items()]
+        hits = {query_lower: [] for query_lower in candidates}
+        for pos, text in enumerate(texts):
+            for query_lower, mask in wanted:
+                if mask[pos] and query_lower in text:
+                    hits[query_lower].append(union[pos])
+        for query_lower, rows in hits.items():
+            matches[query_lower] = np.array(rows, dtype=union.dtype)
+    
+    by_query = {query_lower: _ranked_records(query_lower, rows, limit, fields) for query_lower, rows in matches.items()}
+    return {name: by_query[name.lower()] for name in names}
 
 def get_medicine_by_id(medicine_id):
     """Get medicine details by ID (using DataFrame index)"""
     if MEDICINE_DATA is None:
         return None
     
-    # Find by index
-    try:
-        if medicine_id < 0 or medicine_id >= len(MEDICINE_DATA):
-            return None
-        row = MEDICINE_DATA.iloc[medicine_id]
-    except:
+    if medicine_id < 0 or medicine_id >= len(_MEDICINE_RECORDS):
         return None
     
-    # Parse price from string like '₹335.68'
-    price_str = str(row['final_price']) if pd.notna(row['final_price']) else '₹50.0'
-    try:
-        price = float(price_str.replace('₹', '').replace(',', '').strip())
-    except:
-        price = 50.0
-    
-    # Clean manufacturer string
-    manufacturer = str(row['drug_manufacturer']) if pd.notna(row['drug_manufacturer']) else 'Unknown'
-    manufacturer = manufacturer.replace('* Mkt:', '').strip()
-    
-    # Get drug content for detailed info (truncated)
-    drug_content = str(row['drug_content']) if pd.notna(row['drug_content']) else ''
-    if len(drug_content) > 500:
-        drug_content = drug_content[:500] + '...'
-    
-    return {
-        'id': medicine_id,
-        'name': str(row['med_name']) if pd.notna(row['med_name']) else '',
-        'generic_name': str(row['generic_name']) if pd.notna(row['generic_name']) else '',
-        'disease': str(row['disease_name']) if pd.notna(row['disease_name']) else '',
-        'composition': str(row['generic_name']) if pd.notna(row['generic_name']) else '',
-        'uses': str(row['disease_name']) if pd.notna(row['disease_name']) else 'General use medicine',
-        'description': drug_content,
-        'sideEffects': 'Consult doctor for side effects information',
-        'manufacturer': manufacturer,
-        'prescription_required': str(row['prescription_required']) == 'Rx required' if pd.notna(row['prescription_required']) else False,
-        'available': True,
-        'price': price,
-        'image_url': str(row['img_urls']).split(',')[0] if pd.notna(row['img_urls']) else '',
-        'drug_variant': str(row['drug_varient']) if pd.notna(row['drug_varient']) else ''
-    }
+    return {**_MEDICINE_RECORDS[medicine_id], **_MEDICINE_DETAILS[medicine_id]}
 
-def analyze_symptoms_with_ai(symptoms, follow_up_answers=None, language='English'):
-    """Use Gemini AI to analyze symptoms via REST API"""
-    try:
-        # ALWAYS get response in English first for reliable JSON parsing
-        prompt = f"""You are a professional medical AI assistant helping patients understand their health issues. 
+# Prompt for symptom analysis; literal braces in the JSON examples are doubled for str.format
+_SYMPTOM_PROMPT_TEMPLATE = """You are a professional medical AI assistant helping patients understand their health issues. 
 
 PATIENT'S INPUT: {symptoms}
 
-{f"PATIENT'S PREVIOUS ANSWERS: {follow_up_answers}" if follow_up_answers else ""}
+{follow_up}
 
 YOUR TASK - FOLLOW THIS SEQUENCE STRICTLY:
 
@@ -534,83 +1177,52 @@ IMPORTANT:
 - No markdown formatting
 - No code blocks
 - Just pure JSON starting with {{ and ending with }}"""
+
+def analyze_symptoms_with_ai(symptoms, follow_up_answers=None, language='English', while_translating=None):
+    """Use Gemini AI to analyze symptoms via REST API
+    
+    while_translating, if given, is called with the English analysis while it is being translated.
+    """
+    cache_key = _ai_cache_key(symptoms, follow_up_answers, language)
+    cached = _AI_CACHE.get(cache_key)
+    if cached is not None:
+        logger.debug("Returning cached symptom analysis")
+        return cached
+    
+    try:
+        # ALWAYS get response in English first for reliable JSON parsing
+        prompt = _SYMPTOM_PROMPT_TEMPLATE.format(
+            symptoms=symptoms,
+            follow_up=f"PATIENT'S PREVIOUS ANSWERS: {follow_up_answers}" if follow_up_answers else "",
+        )
         
-        # Call Gemini REST API directly
-        response_text = call_gemini_api(prompt)
+        # Call Gemini REST API directly, streaming so we can stop once the JSON is complete
+        response_text = call_gemini_api(prompt, stop_at_json=True)
         
-        print("="*80)
-        print("GEMINI API RESPONSE:")
-        print("="*80)
-        print(response_text)
-        print("="*80)
-        
-        # Clean up response text - multiple aggressive strategies
-        original_response = response_text
-        response_text = response_text.strip()
-        
-        # Strategy 1: Remove markdown code blocks if present
-        if '```' in response_text:
-            # Remove all markdown code block markers
-            response_text = response_text.replace('```json', '').replace('```', '').strip()
-            print("Removed markdown code blocks")
-        
-        # Strategy 2: Find the JSON object boundaries
-        # Look for the first { and last }
-        first_brace = response_text.find('{')
-        last_brace = response_text.rfind('}')
-        
-        if first_brace != -1 and last_brace != -1 and last_brace > first_brace:
-            extracted_json = response_text[first_brace:last_brace + 1]
-            print(f"Extracted JSON from position {first_brace} to {last_brace}")
-            print(f"Extracted JSON (first 200 chars): {extracted_json[:200]}")
-            response_text = extracted_json
-        
-        # Strategy 3: Clean up any remaining issues
-        response_text = response_text.strip()
-        
-        # Strategy 4: Try to parse and if it fails, try to fix common issues
-        max_attempts = 3
-        for attempt in range(max_attempts):
-            try:
-                result = json.loads(response_text)
-                print(f"✓ Successfully parsed JSON on attempt {attempt + 1}")
-                break
-            except json.JSONDecodeError as e:
-                print(f"Attempt {attempt + 1} - JSON Parse Error at position {e.pos}: {e.msg}")
-                
-                if attempt < max_attempts - 1:
-                    # Try to fix common issues
-                    # Fix 1: Remove any text before first {
-                    if not response_text.startswith('{'):
-                        idx = response_text.find('{')
-                        if idx > 0:
-                            response_text = response_text[idx:]
-                            print(f"  Fixed: Removed {idx} characters before first brace")
-                            continue
-                    
-                    # Fix 2: Remove any text after last }
-                    if not response_text.endswith('}'):
-                        idx = response_text.rfind('}')
-                        if idx > 0:
-                            response_text = response_text[:idx + 1]
-                            print(f"  Fixed: Removed text after last brace")
-                            continue
-                
-                # If all attempts failed, create default response
-                if attempt == max_attempts - 1:
-                    print("All JSON parsing attempts failed, using default response")
-                    result = None
+        logger.debug("GEMINI API RESPONSE:\n%s", response_text)
+        
+        # Extract the JSON object in one pass, dropping any markdown fences or text around it
+        match = _JSON_BLOCK_RE.search(response_text)
+        if match:
+            response_text = match.group(0)
+            logger.debug("Extracted JSON (first 200 chars): %.200s", response_text)
+        
+        try:
+            result = parse_json(response_text)
+            logger.debug("Successfully parsed JSON")
+        except json.JSONDecodeError as e:
+            logger.warning("JSON Parse Error at position %s: %s, using default response", e.pos, e.msg)
+            result = None
         
         # If parsing succeeded, validate and set defaults
         if result and isinstance(result, dict):
-            print("✓ JSON parsed successfully, validating fields...")
+            logger.debug("JSON parsed successfully, validating fields...")
             
             # Check if this is a valid health query
             is_valid = result.get('isValidHealthQuery', True)
             needs_clarification = result.get('needsClarification', False)
             
-            print(f"  Valid health query: {is_valid}")
-            print(f"  Needs clarification: {needs_clarification}")
+            logger.debug("  Valid health query: %s, needs clarification: %s", is_valid, needs_clarification)
             
             # Ensure all required fields exist with defaults
             result.setdefault('isValidHealthQuery', True)
@@ -636,14 +1248,16 @@ IMPORTANT:
                 result['suggestedMedicines'] = []
                 result['recommendations'] = [] if not is_valid else result.get('recommendations', [])
             
-            print(f"  Analysis length: {len(result['analysis'])} chars")
-            print(f"  Follow-up questions: {len(result.get('followUpQuestions', []))}")
-            print(f"  Recommendations: {len(result.get('recommendations', []))}")
-            print(f"  Medicines: {len(result.get('suggestedMedicines', []))}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("  Analysis length: %d chars, follow-up questions: %d, recommendations: %d, medicines: %d",
+                             len(result['analysis']), len(result.get('followUpQuestions', [])),
+                             len(result.get('recommendations', [])), len(result.get('suggestedMedicines', [])))
+            parsed_ok = True
                 
         else:
             # If JSON parsing completely failed, return structured error
-            print("❌ Complete JSON parsing failure, returning error response")
+            logger.warning("Complete JSON parsing failure, returning error response")
+            parsed_ok = False
             result = {
                 'isValidHealthQuery': True,
                 'needsClarification': True,
@@ -657,16 +1271,28 @@ IMPORTANT:
             }
         
         # If language is not English, translate the text fields
+        english_result = None
         if language != 'English' and result:
-            print(f"Translating response to {language}...")
-            result = translate_medical_response(result, language)
+            logger.debug("Translating response to %s...", language)
+            english_result = result
+            result = translate_medical_response(
+                english_result, language,
+                while_waiting=(lambda: while_translating(english_result)) if while_translating else None
+            )
+            # Medicine names are looked up in the (English) dataset, so never take translated ones
+            if isinstance(result, dict):
+                result['suggestedMedicines'] = english_result.get('suggestedMedicines', [])
+        
+        # Only cache real analyses, never the fallback error response; a failed translation
+        # returns the English result itself, which must not be cached under another language
+        translation_failed = language != 'English' and result is english_result
+        if parsed_ok and not translation_failed:
+            _AI_CACHE.put(cache_key, result)
         
         return result
         
     except Exception as e:
-        print(f"AI Analysis Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("AI Analysis Error: %s", e)
         
         return {
             'isValidHealthQuery': True,
@@ -710,10 +1336,13 @@ def login():
                     'message': 'Your registration was rejected. Please contact support.'
                 }), 403
         
-        # In production, use proper password hashing (bcrypt, etc.)
-        if user.get('password') == password and user.get('type') == user_type:
+        if user.get('type') == user_type and verify_password(password, user.get('password')):
+            # Upgrade accounts created before passwords were hashed
+            if not is_password_hash(user.get('password')):
+                db.users.update_one({'_id': user['_id']}, {'$set': {'password': hash_password(password)}})
+            
             # Return user without password and MongoDB _id
-            user_response = {k: v for k, v in user.items() if k not in ['password', '_id']}
+            user_response = {k: v for k, v in user.items() if k not in ['password', '_id', 'licenseCertificateId']}
             return jsonify({
                 'success': True,
                 'user': user_response
@@ -734,23 +1363,19 @@ def register_doctor():
             if not data.get(field):
                 return jsonify({'success': False, 'message': f'Missing required field: {field}'}), 400
         
-        # Check if doctor already registered
-        existing_user = get_user_by_email(data['email'])
-        if existing_user:
-            return jsonify({'success': False, 'message': 'Email already registered'}), 400
-        
         # Create doctor registration in MongoDB
         doctor_data = {
             'name': data['name'],
             'email': data['email'],
-            'password': data['password'],  # In production, hash this!
+            'password': hash_password(data['password']),
             'type': 'doctor',
             'licenseNumber': data['licenseNumber'],
             'specialization': data['specialization'],
             'hospitalAffiliation': data.get('hospitalAffiliation', ''),
             'phone': data['phone'],
             'yearsOfExperience': data.get('yearsOfExperience', 0),
-            'licenseCertificate': data['licenseCertificate'],
+            # The certificate file lives in GridFS; the user document only references it
+            'licenseCertificateId': store_license_certificate(data['licenseCertificate'], data['licenseFileName']),
             'licenseFileName': data['licenseFileName'],
             'registrationStatus': 'pending',  # pending, approved, rejected
             'submittedAt': datetime.now().isoformat(),
@@ -758,8 +1383,14 @@ def register_doctor():
             'reviewNotes': None
         }
         
-        # Insert into database
-        result = db.db.users.insert_one(doctor_data)
+        # Insert into database; the case-insensitive unique email index rejects duplicates
+        try:
+            result = db.users.insert_one(doctor_data)
+        except DuplicateKeyError:
+            delete_license_certificate(doctor_data['licenseCertificateId'])
+            return jsonify({'success': False, 'message': 'Email already registered'}), 400
+        
+        invalidate_doctor_recipients()
         
         return jsonify({
             'success': True,
@@ -768,7 +1399,7 @@ def register_doctor():
         })
         
     except Exception as e:
-        print(f"Error in doctor registration: {e}")
+        logger.exception("Error in doctor registration: %s", e)
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @app.route('/api/auth/register-patient', methods=['POST'])
@@ -783,27 +1414,25 @@ def register_patient():
             if not data.get(field):
                 return jsonify({'success': False, 'message': f'Missing required field: {field}'}), 400
         
-        # Check if patient already registered
-        existing_user = get_user_by_email(data['email'])
-        if existing_user:
-            return jsonify({'success': False, 'message': 'Email already registered'}), 400
-        
         # Get next user ID
-        patient_count = db.db.users.count_documents({'type': 'patient'}) if db.is_connected() else 0
+        patient_seq = next_sequence('patients') if db.is_connected() else 1
         
         # Create patient in MongoDB
         patient_data = {
-            'id': str(patient_count + 100),  # Start from 100 to avoid conflicts with demo users
+            'id': str(patient_seq + 99),  # Start from 100 to avoid conflicts with demo users
             'name': data['name'],
             'email': data['email'],
-            'password': data['password'],  # In production, hash this!
+            'password': hash_password(data['password']),
             'type': 'patient',
             'phone': data['phone'],
             'registeredAt': datetime.now().isoformat()
         }
         
-        # Insert into database
-        result = db.db.users.insert_one(patient_data)
+        # Insert into database; the case-insensitive unique email index rejects duplicates
+        try:
+            result = db.users.insert_one(patient_data)
+        except DuplicateKeyError:
+            return jsonify({'success': False, 'message': 'Email already registered'}), 400
         
         return jsonify({
             'success': True,
@@ -812,50 +1441,139 @@ def register_patient():
         })
         
     except Exception as e:
-        print(f"Error in patient registration: {e}")
+        logger.exception("Error in patient registration: %s", e)
         return jsonify({'success': False, 'message': str(e)}), 500
 
 # ==================== ADMIN ENDPOINTS ====================
 
+def stream_json_list(fields, key, items):
+    """Stream a JSON object of fields plus a key holding items, serializing one item at a time"""
+    dumps = app.json.dumps
+    def generate():
+        head = dumps(fields)
+        yield head[:-1] + (',' if fields else '') + dumps(key) + ':['
+        try:
+            for i, item in enumerate(items):
+                yield (',' if i else '') + dumps(item)
+        except Exception:
+            # The route has already returned by now, so its error handling can't see this
+            logger.exception("Error streaming %s", key)
+            yield '],"error":' + dumps(f'Failed to load all {key}') + '}'
+            return
+        yield ']}'
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+# Only the fields the admin review screen renders. License certificates are served by
+# the certificate endpoint instead
+DOCTOR_REGISTRATION_PROJECTION = {
+    'name': 1, 'email': 1, 'licenseNumber': 1, 'specialization': 1, 'hospitalAffiliation': 1,
+    'phone': 1, 'yearsOfExperience': 1, 'licenseFileName': 1,
+    'registrationStatus': 1, 'submittedAt': 1, 'reviewedAt': 1, 'reviewNotes': 1
+}
+
+def format_doctor_registration(doctor):
+    """Convert a doctor document to the registration shape used by the admin UI"""
+    doctor_id = doctor['_id'].binary.hex()
+    return {
+        'id': doctor_id,  # Stable MongoDB id, used by the review endpoint
+        '_mongoId': doctor_id,
+        'name': doctor.get('name', ''),
+        'email': doctor.get('email', ''),
+        'licenseNumber': doctor.get('licenseNumber', ''),
+        'specialization': doctor.get('specialization', ''),
+        'hospitalAffiliation': doctor.get('hospitalAffiliation', ''),
+        'phone': doctor.get('phone', ''),
+        'yearsOfExperience': doctor.get('yearsOfExperience', 0),
+        'licenseFileName': doctor.get('licenseFileName', ''),
+        'status': doctor.get('registrationStatus', 'approved'),  # Default to approved for legacy
+        'submittedAt': doctor.get('submittedAt', datetime.now().isoformat()),
+        'reviewedAt': doctor.get('reviewedAt'),
+        'reviewNotes': doctor.get('reviewNotes', '')
+    }
+
 @app.route('/api/admin/doctor-registrations', methods=['GET'])
 def get_doctor_registrations():
-    """Get all doctor registrations for admin review"""
+    """Get doctor registrations for admin review, optionally filtered by status and paginated"""
     try:
-        # Get all doctors with registration status
-        doctors = list(db.db.users.find(
-            {'type': 'doctor'},
-            {'password': 0}  # Don't return passwords
-        ))
-        
-        # Convert ObjectId to string and format response
-        formatted_doctors = []
-        for idx, doctor in enumerate(doctors):
-            formatted_doctor = {
-                'id': idx + 1,  # Simple incrementing ID for frontend
-                '_mongoId': str(doctor.get('_id', '')),
-                'name': doctor.get('name', ''),
-                'email': doctor.get('email', ''),
-                'licenseNumber': doctor.get('licenseNumber', ''),
-                'specialization': doctor.get('specialization', ''),
-                'hospitalAffiliation': doctor.get('hospitalAffiliation', ''),
-                'phone': doctor.get('phone', ''),
-                'yearsOfExperience': doctor.get('yearsOfExperience', 0),
-                'licenseCertificate': doctor.get('licenseCertificate', ''),
-                'licenseFileName': doctor.get('licenseFileName', ''),
-                'status': doctor.get('registrationStatus', 'approved'),  # Default to approved for legacy
-                'submittedAt': doctor.get('submittedAt', datetime.now().isoformat()),
-                'reviewedAt': doctor.get('reviewedAt'),
-                'reviewNotes': doctor.get('reviewNotes', '')
-            }
-            formatted_doctors.append(formatted_doctor)
-        
-        return jsonify({'success': True, 'registrations': formatted_doctors})
+        query = {'type': 'doctor'}
+        status = request.args.get('status')
+        if status == 'approved':
+            query['registrationStatus'] = {'$in': ['approved', None]}  # Legacy doctors have no status
+        elif status:
+            query['registrationStatus'] = status
+        
+        # Newest registrations first, whether streamed in full or paginated
+        doctors = db.users.find(query, DOCTOR_REGISTRATION_PROJECTION).sort('_id', -1)
+        
+        # Only the requested page is fetched from MongoDB when paginating
+        page = request.args.get('page', type=int)
+        if page is None:
+            # The full list is streamed as the cursor is read instead of being built in memory
+            doctors = doctors.batch_size(100)
+            return stream_json_list({'success': True}, 'registrations', map(format_doctor_registration, doctors))
+        
+        page = max(page, 1)
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+        doctors = doctors.skip((page - 1) * per_page).limit(per_page)
+        formatted_doctors = [format_doctor_registration(doctor) for doctor in doctors]
+        
+        total = db.users.count_documents(query)
+        return jsonify({
+            'success': True,
+            'registrations': formatted_doctors,
+            'total': total,
+            'page': page,
+            'pages': (total + per_page - 1) // per_page
+        })
         
     except Exception as e:
-        print(f"Error getting doctor registrations: {e}")
+        logger.exception("Error getting doctor registrations: %s", e)
         return jsonify({'success': False, 'message': str(e)}), 500
 
-@app.route('/api/admin/doctor-registrations/<int:doctor_id>/review', methods=['PUT'])
+@app.route('/api/admin/doctor-registrations/<string:doctor_id>', methods=['GET'])
+def get_doctor_registration(doctor_id):
+    """Get a single doctor registration"""
+    oid = to_object_id(doctor_id)
+    if not oid:
+        return jsonify({'success': False, 'message': 'Doctor not found'}), 404
+    
+    doctor = db.users.find_one({'_id': oid, 'type': 'doctor'}, DOCTOR_REGISTRATION_PROJECTION)
+    if not doctor:
+        return jsonify({'success': False, 'message': 'Doctor not found'}), 404
+    
+    registration = format_doctor_registration(doctor)
+    registration['licenseCertificateUrl'] = f'/api/admin/doctor-registrations/{doctor_id}/certificate'
+    return jsonify({'success': True, 'registration': registration})
+
+@app.route('/api/admin/doctor-registrations/<string:doctor_id>/certificate', methods=['GET'])
+def get_doctor_certificate(doctor_id):
+    """Stream a doctor's license certificate file"""
+    oid = to_object_id(doctor_id)
+    if not oid:
+        return jsonify({'success': False, 'message': 'Doctor not found'}), 404
+    
+    doctor = db.users.find_one({'_id': oid, 'type': 'doctor'},
+                                  {'licenseCertificateId': 1, 'licenseCertificate': 1, 'licenseFileName': 1})
+    if not doctor:
+        return jsonify({'success': False, 'message': 'Doctor not found'}), 404
+    
+    filename = (doctor.get('licenseFileName') or 'certificate').replace('"', '')
+    headers = {'Content-Disposition': f'inline; filename="{filename}"'}
+    
+    if doctor.get('licenseCertificateId'):
+        certificate = open_license_certificate(doctor['licenseCertificateId'])
+        if certificate:
+            # Stream one GridFS chunk at a time, so the file is never fully loaded in memory
+            # (iterating a GridOut would split binary files on newline bytes instead)
+            return Response(iter(certificate.readchunk, b''), mimetype=certificate.content_type, headers=headers)
+    elif doctor.get('licenseCertificate'):
+        # Registrations from before GridFS still carry the certificate inline
+        content, content_type = decode_certificate(doctor['licenseCertificate'], filename)
+        return Response(content, mimetype=content_type, headers=headers)
+    
+    return jsonify({'success': False, 'message': 'Certificate not found'}), 404
+
+@app.route('/api/admin/doctor-registrations/<string:doctor_id>/review', methods=['PUT'])
 def review_doctor_registration(doctor_id):
     """Admin endpoint to approve or reject doctor registration"""
     try:
@@ -866,17 +1584,13 @@ def review_doctor_registration(doctor_id):
         if status not in ['approved', 'rejected']:
             return jsonify({'success': False, 'message': 'Invalid status'}), 400
         
-        # Get all doctors and find by index (since we use incrementing IDs)
-        doctors = list(db.db.users.find({'type': 'doctor'}))
-        
-        if doctor_id < 1 or doctor_id > len(doctors):
+        oid = to_object_id(doctor_id)
+        if not oid:
             return jsonify({'success': False, 'message': 'Doctor not found'}), 404
         
-        doctor = doctors[doctor_id - 1]  # Convert 1-based ID to 0-based index
-        
         # Update registration status using MongoDB _id
-        update_result = db.db.users.update_one(
-            {'_id': doctor['_id']},
+        update_result = db.users.update_one(
+            {'_id': oid, 'type': 'doctor'},
             {
                 '$set': {
                     'registrationStatus': status,
@@ -886,7 +1600,9 @@ def review_doctor_registration(doctor_id):
             }
         )
         
-        if update_result.modified_count > 0:
+        if update_result.matched_count == 0:
+            return jsonify({'success': False, 'message': 'Doctor not found'}), 404
+        elif update_result.modified_count > 0:
             return jsonify({
                 'success': True,
                 'message': f'Doctor registration {status} successfully'
@@ -895,7 +1611,7 @@ def review_doctor_registration(doctor_id):
             return jsonify({'success': False, 'message': 'Failed to update registration'}), 500
             
     except Exception as e:
-        print(f"Error reviewing doctor registration: {e}")
+        logger.exception("Error reviewing doctor registration: %s", e)
         return jsonify({'success': False, 'message': str(e)}), 500
 
 # ==================== MEDICINE ENDPOINTS ====================
@@ -920,6 +1636,15 @@ def get_medicine(medicine_id):
         return jsonify({'medicine': medicine})
     return jsonify({'error': 'Medicine not found'}), 404
 
+# Fields returned by the paginated listing (a subset of the search record)
+MEDICINE_LIST_FIELDS = ('id', 'name', 'generic_name', 'disease', 'composition', 'manufacturer',
+                        'prescription_required', 'available', 'price', 'image_url')
+
+# Recent listing searches -> matching row indices, kept as read-only arrays so pages share
+# them without copying. Only queries of 3+ characters are cached: shorter ones already
+# resolve to a stored bigram or single-character postings array
+_LISTING_MATCH_CACHE = LRUCache(max_entries=256, copy_values=False)
+
 @app.route('/api/medicines/all', methods=['GET'])
 def get_all_medicines():
     """Get all medicines with pagination"""
@@ -930,48 +1655,31 @@ def get_all_medicines():
     if MEDICINE_DATA is None:
         return jsonify({'medicines': [], 'total': 0, 'pages': 0})
     
-    # Filter by search query if provided
-    if search:
-        filtered_data = MEDICINE_DATA[
-            MEDICINE_DATA['med_name'].str.lower().str.contains(search, na=False) |
-            MEDICINE_DATA['generic_name'].str.lower().str.contains(search, na=False) |
-            MEDICINE_DATA['disease_name'].str.lower().str.contains(search, na=False)
-        ]
-    else:
-        filtered_data = MEDICINE_DATA
-    
     start_idx = (page - 1) * per_page
     end_idx = start_idx + per_page
     
-    total = len(filtered_data)
-    medicines_page = filtered_data.iloc[start_idx:end_idx]
+    # Filter by search query if provided, using the pre-lowercased search index
+    if search:
+        # Paging through one search re-runs the same query, so reuse its matches
+        matches = _LISTING_MATCH_CACHE.get(search) if len(search) >= 3 else None
+        if matches is None:
+            matches = match_medicine_indices(search)
+            if len(search) >= 3:
+                matches.setflags(write=False)
+                _LISTING_MATCH_CACHE.put(search, matches)
+        total = len(matches)
+        page_rows = matches[start_idx:end_idx]
+    else:
+        total = len(MEDICINE_DATA)
+        page_rows = range(total)[start_idx:end_idx]
     
+    # Rows were parsed once at load; only pick the fields this listing returns
     medicines = []
-    for idx, row in medicines_page.iterrows():
-        # Parse price from string like '₹335.68'
-        price_str = str(row['final_price']) if pd.notna(row['final_price']) else '₹50.0'
-        try:
-            price = float(price_str.replace('₹', '').replace(',', '').strip())
-        except:
-            price = 50.0
-        
-        # Clean manufacturer string
-        manufacturer = str(row['drug_manufacturer']) if pd.notna(row['drug_manufacturer']) else 'Unknown'
-        manufacturer = manufacturer.replace('* Mkt:', '').strip()
-        
-        medicines.append({
-            'id': idx,
-            'name': str(row['med_name']) if pd.notna(row['med_name']) else '',
-            'generic_name': str(row['generic_name']) if pd.notna(row['generic_name']) else '',
-            'disease': str(row['disease_name']) if pd.notna(row['disease_name']) else '',
-            'composition': str(row['generic_name']) if pd.notna(row['generic_name']) else '',
-            'uses': str(row['disease_name']) if pd.notna(row['disease_name']) else 'General use',
-            'manufacturer': manufacturer,
-            'prescription_required': str(row['prescription_required']) == 'Rx required' if pd.notna(row['prescription_required']) else False,
-            'available': True,
-            'price': price,
-            'image_url': str(row['img_urls']).split(',')[0] if pd.notna(row['img_urls']) else ''
-        })
+    for idx in page_rows:
+        record = _MEDICINE_RECORDS[idx]
+        medicine = {field: record[field] for field in MEDICINE_LIST_FIELDS}
+        medicine['uses'] = record['disease'] or 'General use'
+        medicines.append(medicine)
     
     return jsonify({
         'medicines': medicines,
@@ -982,6 +1690,15 @@ def get_all_medicines():
 
 # ==================== MEDICINE DETAILS WITH AI ====================
 
+def _translate_and_cache_usages(usages_data, language, cache_key):
+    """Translate medicine usages, caching the result only if the translation succeeded"""
+    logger.debug("Translating medicine info to %s", language)
+    translated = translate_medical_response(usages_data, language)
+    # translate_medical_response hands back the original dict when translation fails
+    if translated is not usages_data:
+        cache_usages(cache_key, translated)
+    return translated
+
 @app.route('/api/medicines/<int:medicine_id>/usages', methods=['GET'])
 def get_medicine_usages(medicine_id):
     """Get detailed medical usages for a medicine using Gemini AI"""
@@ -992,7 +1709,27 @@ def get_medicine_usages(medicine_id):
     # Get language from query parameter (default to English)
     language = request.args.get('language', 'English')
     
+    # Usages only depend on the medicine and language, so serve repeat lookups from the cache
+    cache_key = f"{medicine_id}:{language}"
+    cached = get_cached_usages(cache_key)
+    if cached is not None:
+        return jsonify({
+            'success': True,
+            'medicine': medicine['name'],
+            'usages': cached
+        })
+    
     try:
+        # Other languages are translated from the English usages, which may already be cached
+        english_key = f"{medicine_id}:English"
+        usages_data = get_cached_usages(english_key) if language != 'English' else None
+        if usages_data is not None:
+            return jsonify({
+                'success': True,
+                'medicine': medicine['name'],
+                'usages': _translate_and_cache_usages(usages_data, language, cache_key)
+            })
+        
         prompt = f"""You are a medical information assistant. Provide detailed, accurate medical information about the following medicine.
 
 MEDICINE DETAILS:
@@ -1032,21 +1769,12 @@ Respond ONLY with valid JSON in this format:
         response_text = call_gemini_api(prompt)
         
         # Clean and parse the response
-        response_text = response_text.strip()
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]
-        if response_text.startswith('```'):
-            response_text = response_text[3:]
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-        
-        usages_data = json.loads(response_text)
+        usages_data = parse_json(strip_json_fence(response_text))
+        cache_usages(english_key, usages_data)
         
         # Translate if not English
         if language != 'English':
-            print(f"Translating medicine info to {language}...")
-            usages_data = translate_medical_response(usages_data, language)
+            usages_data = _translate_and_cache_usages(usages_data, language, cache_key)
         
         return jsonify({
             'success': True,
@@ -1055,7 +1783,7 @@ Respond ONLY with valid JSON in this format:
         })
         
     except json.JSONDecodeError as e:
-        print(f"JSON parse error: {e}")
+        logger.warning("JSON parse error: %s", e)
         # Return basic info if AI fails
         return jsonify({
             'success': True,
@@ -1073,7 +1801,7 @@ Respond ONLY with valid JSON in this format:
             }
         })
     except Exception as e:
-        print(f"Error getting medicine usages: {e}")
+        logger.exception("Error getting medicine usages: %s", e)
         return jsonify({
             'success': False,
             'error': str(e)
@@ -1091,6 +1819,15 @@ def get_medicine_usages_by_name():
     if not medicine_name:
         return jsonify({'error': 'Medicine name is required'}), 400
     
+    cache_key = f"name:{medicine_name.strip().lower()}|{generic_name.strip().lower()}|{dosage.strip().lower()}"
+    cached = get_cached_usages(cache_key)
+    if cached is not None:
+        return jsonify({
+            'success': True,
+            'medicine': medicine_name,
+            'usages': cached
+        })
+    
     try:
         # ALWAYS get medicine info in English first
         prompt = f"""You are a medical information assistant. Provide detailed, accurate medical information about the following medicine.
@@ -1132,16 +1869,8 @@ Respond ONLY with valid JSON in this format:
         response_text = call_gemini_api(prompt)
         
         # Clean and parse the response
-        response_text = response_text.strip()
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]
-        if response_text.startswith('```'):
-            response_text = response_text[3:]
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-        
-        usages_data = json.loads(response_text)
+        usages_data = parse_json(strip_json_fence(response_text))
+        cache_usages(cache_key, usages_data)
         
         return jsonify({
             'success': True,
@@ -1150,7 +1879,7 @@ Respond ONLY with valid JSON in this format:
         })
         
     except json.JSONDecodeError as e:
-        print(f"JSON parse error: {e}")
+        logger.warning("JSON parse error: %s", e)
         return jsonify({
             'success': True,
             'medicine': medicine_name,
@@ -1167,7 +1896,7 @@ Respond ONLY with valid JSON in this format:
             }
         })
     except Exception as e:
-        print(f"Error getting medicine usages by name: {e}")
+        logger.exception("Error getting medicine usages by name: %s", e)
         return jsonify({
             'success': False,
             'error': str(e)
@@ -1175,6 +1904,49 @@ Respond ONLY with valid JSON in this format:
 
 # ==================== AI HEALTH CHAT ENDPOINTS ====================
 
+def resolve_suggested_medicines(analysis):
+    """Look up the dataset entries for an analysis' suggested medicine names"""
+    # Only search for medicines if the query is valid and doesn't need clarification
+    if not analysis.get('isValidHealthQuery') or analysis.get('needsClarification'):
+        logger.debug("Skipping medicine search - query needs validation or clarification")
+        return []
+    
+    suggested_medicines_data = []
+    suggested_names = analysis.get('suggestedMedicines', [])
+    # Look up every suggested name first, then retry the misses with parentheses
+    # removed (e.g. "Paracetamol (Acetaminophen)")
+    found_by_name = search_medicine_names(suggested_names, limit=3)
+    clean_names = {name: name.replace('(', '').replace(')', '').strip()
+                   for name in suggested_names if not found_by_name[name]}
+    found_by_clean_name = search_medicine_names(clean_names.values(), limit=3)
+    
+    for medicine_name in suggested_names:
+        logger.debug("Searching for medicine: %s", medicine_name)
+        found = found_by_name[medicine_name]
+        if found:
+            logger.debug("  Found %d matches for '%s'", len(found), medicine_name)
+            suggested_medicines_data.append(found[0])
+        else:
+            clean_name = clean_names[medicine_name]
+            logger.debug("  Trying clean name: %s", clean_name)
+            found = found_by_clean_name[clean_name]
+            if found:
+                logger.debug("  Found %d matches for '%s'", len(found), clean_name)
+                suggested_medicines_data.append(found[0])
+            else:
+                logger.debug("  No matches found for '%s'", medicine_name)
+    
+    # Remove duplicates based on medicine ID
+    seen_ids = set()
+    unique_medicines = []
+    for med in suggested_medicines_data:
+        if med['id'] not in seen_ids:
+            seen_ids.add(med['id'])
+            unique_medicines.append(med)
+    
+    logger.debug("Found %d medicines for suggestions", len(unique_medicines))
+    return unique_medicines
+
 @app.route('/api/chat/analyze', methods=['POST'])
 def analyze_symptoms():
     """Analyze symptoms using AI"""
@@ -1186,46 +1958,19 @@ def analyze_symptoms():
     if not symptoms:
         return jsonify({'error': 'Symptoms are required'}), 400
     
-    analysis = analyze_symptoms_with_ai(symptoms, follow_up_answers, language)
+    # Medicine names stay in English, so resolve them from the English analysis while
+    # a non-English response is still being translated
+    resolved = {}
+    def resolve(english_analysis):
+        resolved['medicines'] = resolve_suggested_medicines(english_analysis)
     
-    print(f"AI Analysis complete. Suggested medicines: {analysis.get('suggestedMedicines', [])}")
-    print(f"Is valid health query: {analysis.get('isValidHealthQuery', True)}")
-    print(f"Needs clarification: {analysis.get('needsClarification', False)}")
+    analysis = analyze_symptoms_with_ai(symptoms, follow_up_answers, language, while_translating=resolve)
     
-    # Only search for medicines if the query is valid and doesn't need clarification
-    suggested_medicines_data = []
-    if analysis.get('isValidHealthQuery') and not analysis.get('needsClarification'):
-        for medicine_name in analysis.get('suggestedMedicines', []):
-            print(f"Searching for medicine: {medicine_name}")
-            # Try to find medicine by name
-            found = search_medicines(medicine_name, limit=3)
-            if found:
-                print(f"  Found {len(found)} matches for '{medicine_name}'")
-                suggested_medicines_data.append(found[0])
-            else:
-                # Try searching by generic name or common variations
-                # Remove parentheses and try again
-                clean_name = medicine_name.replace('(', '').replace(')', '').strip()
-                print(f"  Trying clean name: {clean_name}")
-                found = search_medicines(clean_name, limit=3)
-                if found:
-                    print(f"  Found {len(found)} matches for '{clean_name}'")
-                    suggested_medicines_data.append(found[0])
-                else:
-                    print(f"  No matches found for '{medicine_name}'")
-        
-        # Remove duplicates based on medicine ID
-        seen_ids = set()
-        unique_medicines = []
-        for med in suggested_medicines_data:
-            if med['id'] not in seen_ids:
-                seen_ids.add(med['id'])
-                unique_medicines.append(med)
-        
-        print(f"Found {len(unique_medicines)} medicines for suggestions")
-    else:
-        unique_medicines = []
-        print("Skipping medicine search - query needs validation or clarification")
+    logger.debug("AI Analysis complete. Suggested medicines: %s, valid health query: %s, needs clarification: %s",
+                 analysis.get('suggestedMedicines', []), analysis.get('isValidHealthQuery', True),
+                 analysis.get('needsClarification', False))
+    
+    unique_medicines = resolved['medicines'] if 'medicines' in resolved else resolve_suggested_medicines(analysis)
     
     return jsonify({
         'isValidHealthQuery': analysis.get('isValidHealthQuery', True),
@@ -1247,10 +1992,10 @@ def create_order_endpoint():
     data = request.json
     
     # Generate order ID
-    order_count = db.db.orders.count_documents({}) if db.is_connected() else 0
+    order_seq = next_sequence('orders') if db.is_connected() else 1
     
     order_data = {
-        'id': f"ORD-{datetime.now().strftime('%Y%m%d')}-{order_count + 1:03d}",
+        'id': f"ORD-{datetime.now().strftime('%Y%m%d')}-{order_seq:03d}",
         'userId': data.get('userId'),
         'medicines': data.get('medicines', []),
         'shop': data.get('shop'),
@@ -1265,9 +2010,9 @@ def create_order_endpoint():
     order = create_order(order_data)
     
     # Create consultation entry
-    consultation_count = db.db.consultations.count_documents({}) if db.is_connected() else 0
+    consultation_seq = next_sequence('consultations') if db.is_connected() else 1
     consultation_data = {
-        'id': consultation_count + 1,
+        'id': consultation_seq,
         'orderId': order_data['id'],
         'userId': data.get('userId'),
         'status': 'pending',
@@ -1276,9 +2021,10 @@ def create_order_endpoint():
     
     consultation = create_consultation(consultation_data)
     
-    # Send notification to all doctors (in-app + SMS)
+    # Send notification to all doctors (in-app + SMS) without delaying the response
     symptoms_preview = data.get('symptoms', '')[:50]
-    notify_doctors_with_sms(
+    run_in_background(
+        notify_doctors_with_sms,
         {
             'type': 'new_consultation',
             'title': 'New Consultation Request',
@@ -1311,6 +2057,25 @@ def get_pending_consultations_endpoint():
     pending = get_pending_consultations()
     return jsonify({'consultations': pending})
 
+def sms_consultation_completed(patient_id, doctor_id, diagnosis):
+    """Text the patient that their consultation has been completed"""
+    # Fetch the patient and doctor together
+    users = get_users_by_ids([patient_id, doctor_id], {'name': 1, 'phone': 1, 'phoneNumber': 1})
+    patient = users.get(patient_id)
+    if patient:
+        patient_phone = patient.get('phone') or patient.get('phoneNumber')
+        if patient_phone:
+            # Get doctor name
+            doctor = users.get(doctor_id) if doctor_id else None
+            doctor_name = doctor.get('name', 'Your doctor') if doctor else 'Your doctor'
+            
+            # Create SMS message
+            sms_message = f'HealthCare: Dr. {doctor_name} completed your consultation. Diagnosis: {diagnosis[:80]}. Login to view prescription & details.'
+            send_sms(patient_phone, sms_message)
+
+# What the update response and the patient notification/SMS need from the updated consultation
+CONSULTATION_UPDATE_FIELDS = {'id': 1, 'userId': 1, 'doctorId': 1, 'status': 1, 'diagnosis': 1, 'updatedAt': 1}
+
 @app.route('/api/consultations/<int:consultation_id>', methods=['PUT'])
 def update_consultation_endpoint(consultation_id):
     """Update consultation (for doctors)"""
@@ -1327,7 +2092,7 @@ def update_consultation_endpoint(consultation_id):
     # Remove None values
     update_data = {k: v for k, v in update_data.items() if v is not None}
     
-    consultation = update_consultation(consultation_id, update_data)
+    consultation = update_consultation(consultation_id, update_data, CONSULTATION_UPDATE_FIELDS)
     
     if consultation:
         # Send in-app notification to patient
@@ -1343,19 +2108,8 @@ def update_consultation_endpoint(consultation_id):
             
             # Send SMS to patient if they have a phone number
             if SMS_ENABLED and twilio_client:
-                patient = get_user_by_id(patient_id)
-                if patient:
-                    patient_phone = patient.get('phone') or patient.get('phoneNumber')
-                    if patient_phone:
-                        # Get doctor name
-                        doctor_id = consultation.get('doctorId')
-                        doctor = get_user_by_id(doctor_id) if doctor_id else None
-                        doctor_name = doctor.get('name', 'Your doctor') if doctor else 'Your doctor'
-                        
-                        # Create SMS message
-                        diagnosis = data.get('diagnosis', 'completed')[:80]
-                        sms_message = f'HealthCare: Dr. {doctor_name} completed your consultation. Diagnosis: {diagnosis}. Login to view prescription & details.'
-                        send_sms(patient_phone, sms_message)
+                run_in_background(sms_consultation_completed, patient_id, consultation.get('doctorId'),
+                                  data.get('diagnosis', 'completed'))
         
         return jsonify({'success': True, 'consultation': consultation})
     
@@ -1363,13 +2117,18 @@ def update_consultation_endpoint(consultation_id):
 
 # ==================== NOTIFICATION ENDPOINTS ====================
 
+# Fields the notification panels read; the list is polled, so skip the rest (e.g. readAt)
+NOTIFICATION_LIST_FIELDS = {'userId': 1, 'type': 1, 'title': 1, 'message': 1, 'read': 1,
+                            'createdAt': 1, 'consultationId': 1, 'orderId': 1}
+
 @app.route('/api/notifications/<user_id>', methods=['GET'])
 def get_notifications_endpoint(user_id):
     """Get notifications for a user"""
     unread_only = request.args.get('unread_only', 'false').lower() == 'true'
     limit = int(request.args.get('limit', 50))
     
-    notifications = get_user_notifications(user_id, limit=limit, unread_only=unread_only)
+    notifications = get_user_notifications(user_id, limit=limit, unread_only=unread_only,
+                                           fields=NOTIFICATION_LIST_FIELDS)
     unread_count = get_unread_count(user_id)
     
     return jsonify({
@@ -1377,10 +2136,13 @@ def get_notifications_endpoint(user_id):
         'unreadCount': unread_count
     })
 
+# Callers only confirm the flag changed
+NOTIFICATION_READ_FIELDS = {'read': 1, 'readAt': 1}
+
 @app.route('/api/notifications/<notification_id>/read', methods=['PUT'])
 def mark_notification_read_endpoint(notification_id):
     """Mark a notification as read"""
-    notification = mark_notification_read(notification_id)
+    notification = mark_notification_read(notification_id, NOTIFICATION_READ_FIELDS)
     
     if notification:
         return jsonify({'success': True, 'notification': notification})
@@ -1404,9 +2166,8 @@ def create_prescription_endpoint():
     """Create prescription"""
     data = request.json
     
-    prescription_count = db.db.prescriptions.count_documents({}) if db.is_connected() else 0
     prescription_data = {
-        'id': prescription_count + 1,
+        'id': next_sequence('prescriptions') if db.is_connected() else 1,
         'userId': data.get('userId'),
         'doctor': data.get('doctor'),
         'medicines': data.get('medicines', []),
@@ -1416,51 +2177,58 @@ def create_prescription_endpoint():
     prescription = create_prescription(prescription_data)
     return jsonify({'success': True, 'prescription': prescription})
 
+# Fields the prescription history shows (createdAt duplicates uploadDate)
+PRESCRIPTION_LIST_FIELDS = {'id': 1, 'userId': 1, 'doctor': 1, 'medicines': 1, 'uploadDate': 1, 'status': 1}
+
 @app.route('/api/prescriptions/<user_id>', methods=['GET'])
 def get_user_prescriptions_endpoint(user_id):
     """Get user prescriptions"""
-    user_prescriptions = get_prescriptions_by_user(user_id)
+    user_prescriptions = get_prescriptions_by_user(user_id, fields=PRESCRIPTION_LIST_FIELDS)
     return jsonify({'prescriptions': user_prescriptions})
 
 # ==================== MEDICAL SHOPS ENDPOINT ====================
 
+# Mock data - in production, use real location API
+NEARBY_SHOPS = [
+    {
+        'id': 1,
+        'name': 'Apollo Pharmacy',
+        'distance': '0.5 km',
+        'rating': 4.5,
+        'address': '123 Main Street, City Center',
+        'phone': '+91 98765 43210',
+        'openNow': True,
+        'deliveryTime': '20-30 mins'
+    },
+    {
+        'id': 2,
+        'name': 'MedPlus',
+        'distance': '1.2 km',
+        'rating': 4.3,
+        'address': '456 Park Avenue, Downtown',
+        'phone': '+91 98765 43211',
+        'openNow': True,
+        'deliveryTime': '30-40 mins'
+    },
+    {
+        'id': 3,
+        'name': 'Wellness Forever',
+        'distance': '2.1 km',
+        'rating': 4.7,
+        'address': '789 Health Road, Medical District',
+        'phone': '+91 98765 43212',
+        'openNow': True,
+        'deliveryTime': '40-50 mins'
+    }
+]
+
+# The shop list never changes, so serialize the response body once at startup
+_NEARBY_SHOPS_BODY = app.json.response({'shops': NEARBY_SHOPS}).get_data()
+
 @app.route('/api/shops/nearby', methods=['GET'])
 def get_nearby_shops():
     """Get nearby medical shops"""
-    # Mock data - in production, use real location API
-    shops = [
-        {
-            'id': 1,
-            'name': 'Apollo Pharmacy',
-            'distance': '0.5 km',
-            'rating': 4.5,
-            'address': '123 Main Street, City Center',
-            'phone': '+91 98765 43210',
-            'openNow': True,
-            'deliveryTime': '20-30 mins'
-        },
-        {
-            'id': 2,
-            'name': 'MedPlus',
-            'distance': '1.2 km',
-            'rating': 4.3,
-            'address': '456 Park Avenue, Downtown',
-            'phone': '+91 98765 43211',
-            'openNow': True,
-            'deliveryTime': '30-40 mins'
-        },
-        {
-            'id': 3,
-            'name': 'Wellness Forever',
-            'distance': '2.1 km',
-            'rating': 4.7,
-            'address': '789 Health Road, Medical District',
-            'phone': '+91 98765 43212',
-            'openNow': True,
-            'deliveryTime': '40-50 mins'
-        }
-    ]
-    return jsonify({'shops': shops})
+    return app.response_class(_NEARBY_SHOPS_BODY, mimetype='application/json')
 
 # ==================== HEALTH CHECK ====================
 
@@ -1477,25 +2245,83 @@ def health_check():
 
 # ==================== IMAGE OCR FOR MEDICINE ====================
 
+# When a Gemini Vision label read is slow, Tesseract starts here alongside it so its result
+# is ready sooner if Vision then fails. OCR is CPU-bound, so the pool matches the CPU count,
+# and speculative runs are only started while a worker is free (they never queue)
+TESSERACT_WORKERS = os.cpu_count() or 2
+_TESSERACT_EXECUTOR = ThreadPoolExecutor(max_workers=TESSERACT_WORKERS, thread_name_prefix='tesseract')
+_TESSERACT_SLOTS = threading.BoundedSemaphore(TESSERACT_WORKERS)
+# How long a running Vision call gets on its own before Tesseract is started alongside it
+OCR_TESSERACT_DELAY_SECONDS = 3
+
+def submit_tesseract_if_idle(image_base64, cancelled):
+    """Start extract_text_with_tesseract on the Tesseract pool if a worker is free, else return None"""
+    if not _TESSERACT_SLOTS.acquire(blocking=False):
+        return None
+    future = _TESSERACT_EXECUTOR.submit(extract_text_with_tesseract, image_base64, cancelled=cancelled)
+    future.add_done_callback(lambda _: _TESSERACT_SLOTS.release())
+    return future
+
+# Tesseract reads best around this width: small images are upscaled, and phone photos
+# (often 3000-4000px) are shrunk so the contrast/sharpen passes touch fewer pixels
+OCR_MIN_WIDTH = 1500
+OCR_MAX_WIDTH = 2000
+
+# Binarization threshold for medicine labels, applied as a precomputed 256-entry lookup table
+# (lower than mid-grey to capture more text)
+LABEL_BINARIZE_THRESHOLD = 120
+_LABEL_BINARIZE_LUT = [255 if p > LABEL_BINARIZE_THRESHOLD else 0 for p in range(256)]
+
+def split_data_url(image_data):
+    """Split an uploaded image into (data URL header, base64 payload) with a single scan
+
+    The header is empty when the client sent bare base64.
+    """
+    header, sep, base64_data = image_data.partition(',')
+    if not sep:
+        return '', header
+    return header, base64_data
+
+def _sniff_mime(header):
+    """Image MIME type named in a data URL header, defaulting to JPEG"""
+    header = header.lower()
+    if 'png' in header:
+        return 'image/png'
+    if 'gif' in header:
+        return 'image/gif'
+    return 'image/jpeg'
+
+def _contrast_lut(image, factor):
+    """Lookup table that stretches a grayscale image's contrast about its mean
+
+    Gives the same pixels as ImageEnhance.Contrast(image).enhance(factor) in one point()
+    pass, without building a flat grey image to blend against.
+    """
+    histogram = image.histogram()
+    mean = int(sum(value * count for value, count in enumerate(histogram)) / sum(histogram) + 0.5)
+    return [min(255, max(0, int(mean + factor * (p - mean)))) for p in range(256)]
+
 def preprocess_image_for_ocr(image, is_prescription=False):
     """Preprocess image to improve OCR accuracy"""
-    # Convert to RGB if necessary
-    if image.mode != 'RGB':
-        image = image.convert('RGB')
-    
-    # Convert to grayscale
-    image = image.convert('L')
+    # Convert to grayscale (palette/alpha/CMYK images go through RGB first)
+    if image.mode != 'L':
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image = image.convert('L')
     
     # Resize if too small (OCR works better with larger images)
     width, height = image.size
-    if width < 1500:
-        ratio = 1500 / width
+    if width < OCR_MIN_WIDTH:
+        ratio = OCR_MIN_WIDTH / width
         image = image.resize((int(width * ratio), int(height * ratio)), Image.Resampling.LANCZOS)
+    elif width > OCR_MAX_WIDTH:
+        # Shrink large photos before the expensive filters (bilinear is fine when downscaling)
+        ratio = OCR_MAX_WIDTH / width
+        image = image.resize((OCR_MAX_WIDTH, max(1, int(height * ratio))), Image.Resampling.BILINEAR)
     
     if is_prescription:
         # For prescriptions: lighter preprocessing to preserve handwriting
-        enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(1.5)
+        image = image.point(_contrast_lut(image, 1.5))
         
         # Light sharpening
         image = image.filter(ImageFilter.SHARPEN)
@@ -1504,43 +2330,69 @@ def preprocess_image_for_ocr(image, is_prescription=False):
         # Don't apply hard threshold for prescriptions
     else:
         # For medicine labels: moderate preprocessing to preserve text
-        enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(1.8)
+        image = image.point(_contrast_lut(image, 1.8))
         
         # Sharpen the image moderately
         image = image.filter(ImageFilter.SHARPEN)
         
         # Apply adaptive threshold (less aggressive to preserve colored text)
         # Only binarize if really needed - many medicine labels have colored text
-        threshold = 120  # Lower threshold to capture more text
-        image = image.point(lambda p: 255 if p > threshold else 0)
+        image = image.point(_LABEL_BINARIZE_LUT)
     
     return image
 
-def extract_text_with_tesseract(image_base64, is_prescription=False):
-    """Extract text from image using Tesseract OCR"""
+def _tesserocr_image_to_string(image, is_prescription=False):
+    """Run OCR on an idle persistent tesserocr engine (engines aren't thread-safe, so each call takes its own)"""
+    try:
+        api = _TESSEROCR_ENGINES.get_nowait()
+    except queue.Empty:
+        api = tesserocr.PyTessBaseAPI(lang='eng', oem=tesserocr.OEM.DEFAULT)
+    try:
+        # Same page segmentation as the pytesseract configs: --psm 4 for prescriptions, 11 for labels
+        api.SetPageSegMode(tesserocr.PSM.SINGLE_COLUMN if is_prescription else tesserocr.PSM.SPARSE_TEXT)
+        api.SetImage(image)
+        return api.GetUTF8Text()
+    finally:
+        api.Clear()
+        _TESSEROCR_ENGINES.put(api)
+
+def extract_text_with_tesseract(image_base64, is_prescription=False, cancelled=None):
+    """Extract text from image using Tesseract OCR
+    
+    If the cancelled event is set before the OCR call starts, it is skipped and '' returned.
+    """
     if not TESSERACT_AVAILABLE:
         raise Exception("Tesseract OCR is not available")
     
-    # Decode base64 image
+    # Decode base64 image; JPEG photos are decoded straight to grayscale (a no-op for other
+    # formats), which skips building the full-size colour image only to convert it away.
+    # Large JPEGs are also scaled down by the decoder, to no less than OCR_MAX_WIDTH
     image_bytes = base64.b64decode(image_base64)
     image = Image.open(BytesIO(image_bytes))
+    width, height = image.size
+    scale = min(1.0, OCR_MAX_WIDTH / width)
+    image.draft('L', (int(width * scale), int(height * scale)))
     
     # Preprocess image for better OCR
     processed_image = preprocess_image_for_ocr(image, is_prescription)
     
-    # Configure Tesseract
-    if is_prescription:
-        # For prescriptions: use block mode and allow more characters
-        custom_config = r'--oem 3 --psm 4 -l eng'
-    else:
-        # For medicine labels: use sparse text mode (better for medicine packages)
-        custom_config = r'--oem 3 --psm 11 -l eng'
+    if cancelled is not None and cancelled.is_set():
+        return ''
     
     # Extract text
-    extracted_text = pytesseract.image_to_string(processed_image, config=custom_config)
+    if TESSEROCR_AVAILABLE:
+        extracted_text = _tesserocr_image_to_string(processed_image, is_prescription)
+    else:
+        # Configure Tesseract
+        if is_prescription:
+            # For prescriptions: use block mode and allow more characters
+            custom_config = r'--oem 3 --psm 4 -l eng'
+        else:
+            # For medicine labels: use sparse text mode (better for medicine packages)
+            custom_config = r'--oem 3 --psm 11 -l eng'
+        extracted_text = pytesseract.image_to_string(processed_image, config=custom_config)
     
-    print(f"Tesseract extracted text: {extracted_text[:200]}..." if len(extracted_text) > 200 else f"Tesseract extracted: {extracted_text}")
+    logger.debug("Tesseract extracted: %.200s", extracted_text)
     
     return extracted_text.strip()
 
@@ -1603,22 +2455,13 @@ If you cannot identify a medicine name, use empty strings."""
     try:
         result = call_gemini_api(prompt)
         
-        # Try to parse as JSON
-        result = result.strip()
-        if result.startswith('```'):
-            result = result.split('\n', 1)[1] if '\n' in result else result[3:]
-        if result.endswith('```'):
-            result = result[:-3]
-        result = result.strip()
-        
         # Find JSON in response
-        import re
-        json_match = re.search(r'\{.*\}', result, re.DOTALL)
+        json_match = _JSON_BLOCK_RE.search(strip_json_fence(result))
         if json_match:
-            parsed = json.loads(json_match.group())
+            parsed = parse_json(json_match.group())
             return parsed
     except Exception as e:
-        print(f"Gemini parsing error: {e}")
+        logger.warning("Gemini parsing error: %s", e)
     
     # Fallback: return first line as medicine name
     lines = ocr_text.split('\n')
@@ -1640,44 +2483,49 @@ If you cannot identify a medicine name, use empty strings."""
             'confidence': 'low'
         }
 
-@app.route('/api/medicines/ocr', methods=['POST'])
-def analyze_medicine_image():
-    """Analyze medicine image using Gemini Vision API (primary) + Tesseract OCR (fallback)"""
+# Large uploads from clients that can poll run on this pool instead of holding a request
+# thread for the whole OCR pipeline
+_OCR_JOB_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ocr-job')
+OCR_ASYNC_MIN_BYTES = 2 * 1024 * 1024
+# A job still pending after this long is reported as failed (Gemini calls time out after 60s
+# each, so a live OCR run finishes well within it)
+OCR_JOB_TIMEOUT_SECONDS = 4 * 60
+
+def _run_ocr_job(job_id, pipeline, error_body, header, base64_data):
+    """Run an OCR pipeline in the background and store its response body on the job"""
+    try:
+        finish_ocr_job(job_id, 'done', pipeline(header, base64_data))
+    except Exception as e:
+        logger.exception("OCR job %s failed: %s", job_id, e)
+        finish_ocr_job(job_id, 'failed', error_body(e))
+
+def handle_ocr_upload(pipeline, error_body):
+    """Run an OCR pipeline on the uploaded image, or queue it and answer 202 with a job id
+
+    Uploads over OCR_ASYNC_MIN_BYTES are queued when the client sends "async": true and
+    MongoDB (which holds job status for every worker) is connected; the rest run inline.
+    """
     try:
         data = request.get_json()
         
         if not data or 'image' not in data:
             return jsonify({'error': 'No image data provided'}), 400
         
-        image_data = data['image']
-        
         # Handle base64 data URL format (data:image/jpeg;base64,...)
-        if ',' in image_data:
-            base64_data = image_data.split(',', 1)[1]
-        else:
-            base64_data = image_data
-        
-        ocr_text = ""
-        medicine_info = None
-        ocr_method = "none"
-        
-        # Step 1: Try Gemini Vision API FIRST (most accurate for medicine images)
-        if GEMINI_API_KEY:
-            try:
-                print("Attempting Gemini Vision API (primary method)...")
-                # Determine mime type
-                if ',' in image_data:
-                    header = image_data.split(',')[0]
-                    if 'png' in header.lower():
-                        mime_type = 'image/png'
-                    elif 'gif' in header.lower():
-                        mime_type = 'image/gif'
-                    else:
-                        mime_type = 'image/jpeg'
-                else:
-                    mime_type = 'image/jpeg'
-                
-                prompt = """Analyze this medicine/tablet package image carefully and extract the following information:
+        header, base64_data = split_data_url(data['image'])
+        
+        if data.get('async') and len(base64_data) * 3 // 4 > OCR_ASYNC_MIN_BYTES and db.is_connected():
+            job_id = create_ocr_job()
+            _OCR_JOB_EXECUTOR.submit(_run_ocr_job, job_id, pipeline, error_body, header, base64_data)
+            return jsonify({'success': True, 'jobId': job_id, 'status': 'pending'}), 202
+        
+        return jsonify(pipeline(header, base64_data))
+        
+    except Exception as e:
+        logger.exception("OCR Error: %s", e)
+        return jsonify(error_body(e)), 500
+
+MEDICINE_LABEL_PROMPT = """Analyze this medicine/tablet package image carefully and extract the following information:
 
 1. **Medicine Brand Name**: The main product name (usually prominent, like "Dolo-650", "Crocin", "Paracetamol", etc.)
 2. **Generic/Salt Name**: The active ingredient (like "Paracetamol", "Ibuprofen", "Amoxicillin", etc.)
@@ -1694,213 +2542,237 @@ Respond in this EXACT JSON format:
 }
 
 If you can't find a specific field, use empty string ""."""
-                
-                vision_result = call_gemini_vision_api(prompt, base64_data, mime_type)
-                ocr_method = "gemini-vision"
-                print(f"✓ Gemini Vision response: {vision_result[:200]}")
-                
-                # Parse the JSON response
-                import re
-                vision_result_clean = vision_result.strip()
-                if '```' in vision_result_clean:
-                    vision_result_clean = vision_result_clean.replace('```json', '').replace('```', '').strip()
-                
-                json_match = re.search(r'\{.*\}', vision_result_clean, re.DOTALL)
-                if json_match:
-                    medicine_info = json.loads(json_match.group())
-                    ocr_text = f"Brand: {medicine_info.get('medicineName', '')}\nGeneric: {medicine_info.get('genericName', '')}\nDosage: {medicine_info.get('dosage', '')}"
-                    print(f"✓ Gemini Vision extracted: {medicine_info}")
-                else:
-                    # Couldn't parse JSON, use text as-is
+
+def read_label_with_gemini(base64_data, mime_type):
+    """Read a medicine label with Gemini Vision, returning (medicine_info, extracted text)"""
+    vision_result = call_gemini_vision_api(MEDICINE_LABEL_PROMPT, base64_data, mime_type)
+    logger.debug("Gemini Vision response: %.200s", vision_result)
+    
+    # Parse the JSON response
+    vision_result_clean = strip_json_fence(vision_result)
+    json_match = _JSON_BLOCK_RE.search(vision_result_clean)
+    if json_match:
+        medicine_info = parse_json(json_match.group())
+        ocr_text = f"Brand: {medicine_info.get('medicineName', '')}\nGeneric: {medicine_info.get('genericName', '')}\nDosage: {medicine_info.get('dosage', '')}"
+        logger.debug("Gemini Vision extracted: %s", medicine_info)
+        return medicine_info, ocr_text
+    
+    # Couldn't parse JSON, use text as-is
+    medicine_info = {
+        'medicineName': vision_result_clean.split('\n')[0].strip()[:100],
+        'genericName': '',
+        'dosage': '',
+        'confidence': 'medium'
+    }
+    return medicine_info, vision_result_clean
+
+def read_medicine_image(header, base64_data):
+    """Run medicine label OCR (Gemini Vision, Tesseract fallback) and match the result against the dataset"""
+    mime_type = _sniff_mime(header)
+    cache_key = _ocr_cache_key('medicine', base64_data)
+    cached = _OCR_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    # A slightly different photo of a recently read package gets the same answer
+    label_hash = image_dhash(base64_data)
+    if label_hash is not None:
+        cached = _LABEL_HASH_CACHE.get(label_hash)
+        if cached is not None:
+            return cached
+    
+    ocr_text = ""
+    medicine_info = None
+    ocr_method = "none"
+    
+    # Step 1: Try Gemini Vision API FIRST (most accurate for medicine images), on this thread.
+    # Tesseract only starts if the call has run for OCR_TESSERACT_DELAY_SECONDS without an
+    # answer, so the usual fast Vision read never pays for an OCR pass
+    tesseract_cancelled = threading.Event()
+    speculative = []
+    if GEMINI_API_KEY:
+        logger.debug("Attempting Gemini Vision API (primary method)...")
+        timer = None
+        if TESSERACT_AVAILABLE:
+            def start_tesseract():
+                logger.debug("Gemini Vision is slow, starting Tesseract alongside it...")
+                speculative.append(submit_tesseract_if_idle(base64_data, tesseract_cancelled))
+            timer = threading.Timer(OCR_TESSERACT_DELAY_SECONDS, start_tesseract)
+            timer.daemon = True
+            timer.start()
+        try:
+            medicine_info, ocr_text = read_label_with_gemini(base64_data, mime_type)
+            ocr_method = "gemini-vision"
+        except Exception as e:
+            logger.warning("Gemini Vision failed: %s", e, exc_info=True)
+        finally:
+            if timer is not None:
+                timer.cancel()
+                timer.join()  # If it already fired, let it finish recording its future
+    tesseract_future = speculative[0] if speculative else None
+    
+    # Step 2: Fallback to Tesseract OCR if Gemini Vision failed
+    if medicine_info:
+        # A speculative run that has not reached the OCR call yet skips it
+        tesseract_cancelled.set()
+        if tesseract_future is not None:
+            tesseract_future.cancel()
+    elif TESSERACT_AVAILABLE:
+        try:
+            logger.debug("Falling back to Tesseract OCR...")
+            if tesseract_future is not None:
+                ocr_text = tesseract_future.result()
+            else:
+                ocr_text = extract_text_with_tesseract(base64_data)
+            ocr_method = "tesseract"
+            logger.debug("Tesseract OCR successful, extracted %d characters", len(ocr_text))
+            
+            # Use Gemini to parse Tesseract output
+            if ocr_text and GEMINI_API_KEY:
+                try:
+                    logger.debug("Using Gemini to analyze Tesseract OCR text...")
+                    medicine_info = extract_medicine_name_with_gemini(ocr_text)
+                    logger.debug("Gemini analysis complete: %s", medicine_info)
+                except Exception as e:
+                    logger.warning("Gemini analysis failed: %s", e)
+                    # Fallback: use first line of OCR text
+                    lines = [l.strip() for l in ocr_text.split('\n') if l.strip()]
                     medicine_info = {
-                        'medicineName': vision_result_clean.split('\n')[0].strip()[:100],
+                        'medicineName': lines[0] if lines else '',
                         'genericName': '',
                         'dosage': '',
-                        'confidence': 'medium'
+                        'confidence': 'low'
                     }
-                    ocr_text = vision_result_clean
-                    
-            except Exception as e:
-                print(f"Gemini Vision failed: {e}")
-                import traceback
-                traceback.print_exc()
-        
-        # Step 2: Fallback to Tesseract OCR if Gemini Vision failed
-        if not medicine_info and TESSERACT_AVAILABLE:
-            try:
-                print("Falling back to Tesseract OCR...")
-                ocr_text = extract_text_with_tesseract(base64_data)
-                ocr_method = "tesseract"
-                print(f"✓ Tesseract OCR successful, extracted {len(ocr_text)} characters")
-                
-                # Use Gemini to parse Tesseract output
-                if ocr_text and GEMINI_API_KEY:
-                    try:
-                        print("Using Gemini to analyze Tesseract OCR text...")
-                        medicine_info = extract_medicine_name_with_gemini(ocr_text)
-                        print(f"✓ Gemini analysis complete: {medicine_info}")
-                    except Exception as e:
-                        print(f"Gemini analysis failed: {e}")
-                        # Fallback: use first line of OCR text
-                        lines = [l.strip() for l in ocr_text.split('\n') if l.strip()]
-                        medicine_info = {
-                            'medicineName': lines[0] if lines else '',
-                            'genericName': '',
-                            'dosage': '',
-                            'confidence': 'low'
-                        }
-            except Exception as e:
-                print(f"Tesseract OCR failed: {e}")
-        
-        # Step 3: Last resort - basic Gemini Vision without JSON parsing
-        if not medicine_info and GEMINI_API_KEY:
-            try:
-                print("Last resort: Basic Gemini Vision extraction...")
-                # Determine mime type
-                if ',' in image_data:
-                    header = image_data.split(',')[0]
-                    if 'png' in header.lower():
-                        mime_type = 'image/png'
-                    elif 'gif' in header.lower():
-                        mime_type = 'image/gif'
-                    else:
-                        mime_type = 'image/jpeg'
-                else:
-                    mime_type = 'image/jpeg'
-                
-                prompt = """What is the medicine name shown in this image? 
+        except Exception as e:
+            logger.warning("Tesseract OCR failed: %s", e)
+    
+    # Step 3: Last resort - basic Gemini Vision without JSON parsing
+    if not medicine_info and GEMINI_API_KEY:
+        try:
+            logger.debug("Last resort: Basic Gemini Vision extraction...")
+            prompt = """What is the medicine name shown in this image? 
 Extract the brand name (like Dolo-650, Crocin, etc.) and generic name (like Paracetamol) if visible.
 Provide just the medicine name clearly."""
-                
-                ocr_text = call_gemini_vision_api(prompt, base64_data, mime_type)
-                ocr_method = "gemini-vision-simple"
-                
-                # Clean up
-                ocr_text = ocr_text.strip().replace('```', '').strip()
-                # Extract first meaningful line as medicine name
-                lines = [l.strip() for l in ocr_text.split('\n') if l.strip() and len(l.strip()) > 2]
-                medicine_info = {
-                    'medicineName': lines[0] if lines else '',
-                    'genericName': lines[1] if len(lines) > 1 else '',
-                    'dosage': '',
-                    'confidence': 'medium'
-                }
-                print(f"✓ Gemini Vision simple extraction successful")
-            except Exception as e:
-                print(f"All OCR methods failed: {e}")
-        
-        if not medicine_info:
+            
+            ocr_text = call_gemini_vision_api(prompt, base64_data, mime_type)
+            ocr_method = "gemini-vision-simple"
+            
+            # Clean up
+            ocr_text = ocr_text.strip().replace('```', '').strip()
+            # Extract first meaningful line as medicine name
+            lines = [l.strip() for l in ocr_text.split('\n') if l.strip() and len(l.strip()) > 2]
             medicine_info = {
-                'medicineName': '',
-                'genericName': '',
+                'medicineName': lines[0] if lines else '',
+                'genericName': lines[1] if len(lines) > 1 else '',
                 'dosage': '',
-                'confidence': 'none'
+                'confidence': 'medium'
             }
-        
-        medicine_name = medicine_info.get('medicineName', '')
-        print(f"Final extracted medicine name: {medicine_name}")
-        
-        # Search for the medicine in our database
-        medicines = []
-        if medicine_name:
-            medicines = search_medicines(medicine_name, limit=10)
-            
-            # If no results with full name, try first word
-            if not medicines and ' ' in medicine_name:
-                first_word = medicine_name.split()[0]
-                medicines = search_medicines(first_word, limit=10)
-            
-            # Also try generic name if available
-            if not medicines and medicine_info.get('genericName'):
-                medicines = search_medicines(medicine_info['genericName'], limit=10)
-        
-        return jsonify({
-            'success': True,
-            'extractedText': ocr_text,
-            'ocrMethod': ocr_method,
-            'ocrResult': {
-                'detected': bool(medicine_name),
-                'medicineName': medicine_name,
-                'genericName': medicine_info.get('genericName', ''),
-                'dosage': medicine_info.get('dosage', ''),
-                'confidence': medicine_info.get('confidence', 'medium'),
-                'additionalInfo': ''
-            },
-            'medicines': medicines
-        })
-        
-    except Exception as e:
-        print(f"OCR Error: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            'success': False,
-            'error': str(e),
-            'ocrResult': None,
-            'medicines': []
-        }), 500
+            logger.debug("Gemini Vision simple extraction successful")
+        except Exception as e:
+            logger.warning("All OCR methods failed: %s", e)
+    
+    if not medicine_info:
+        medicine_info = {
+            'medicineName': '',
+            'genericName': '',
+            'dosage': '',
+            'confidence': 'none'
+        }
+    
+    medicine_name = medicine_info.get('medicineName', '')
+    logger.debug("Final extracted medicine name: %s", medicine_name)
+    
+    # Search for the medicine in our database
+    medicines = []
+    if medicine_name:
+        medicines = search_medicines(medicine_name, limit=10)
+        
+        # If no results with full name, try first word
+        if not medicines and ' ' in medicine_name:
+            first_word = medicine_name.split()[0]
+            medicines = search_medicines(first_word, limit=10)
+        
+        # Also try generic name if available
+        if not medicines and medicine_info.get('genericName'):
+            medicines = search_medicines(medicine_info['genericName'], limit=10)
+    
+    result = {
+        'success': True,
+        'extractedText': ocr_text,
+        'ocrMethod': ocr_method,
+        'ocrResult': {
+            'detected': bool(medicine_name),
+            'medicineName': medicine_name,
+            'genericName': medicine_info.get('genericName', ''),
+            'dosage': medicine_info.get('dosage', ''),
+            'confidence': medicine_info.get('confidence', 'medium'),
+            'additionalInfo': ''
+        },
+        'medicines': medicines
+    }
+    # Don't remember failed reads - the next attempt may succeed
+    if medicine_name:
+        _OCR_CACHE.put(cache_key, result)
+        if label_hash is not None:
+            _LABEL_HASH_CACHE.put(label_hash, result)
+    return result
 
-@app.route('/api/prescriptions/ocr', methods=['POST'])
-def analyze_prescription_image():
-    """Analyze prescription image using Tesseract OCR + Gemini AI to extract medicine details"""
-    try:
-        data = request.get_json()
-        
-        if not data or 'image' not in data:
-            return jsonify({'error': 'No image data provided'}), 400
-        
-        image_data = data['image']
-        
-        # Handle base64 data URL format
-        if ',' in image_data:
-            base64_data = image_data.split(',', 1)[1]
-        else:
-            base64_data = image_data
-        
-        ocr_text = ""
-        prescription_info = None
-        ocr_method = "none"
-        
-        # Step 1: Try Tesseract OCR for prescription (with prescription-specific settings)
-        if TESSERACT_AVAILABLE:
-            try:
-                print("Attempting Tesseract OCR for prescription...")
-                ocr_text = extract_text_with_tesseract(base64_data, is_prescription=True)
-                ocr_method = "tesseract"
-                print(f"✓ Tesseract OCR successful, extracted {len(ocr_text)} characters")
-            except Exception as e:
-                print(f"Tesseract OCR failed: {e}")
-        
-        # Step 2: Use Gemini to extract prescription details
-        if ocr_text:
-            try:
-                print("Using Gemini to analyze prescription text...")
-                prescription_info = extract_medicine_name_with_gemini(ocr_text, is_prescription=True)
-                print(f"✓ Gemini analysis complete: {prescription_info}")
-            except Exception as e:
-                print(f"Gemini analysis failed: {e}")
-                prescription_info = {
-                    'medicines': [],
-                    'doctorName': '',
-                    'patientName': '',
-                    'date': '',
-                    'confidence': 'low'
-                }
-        
-        # Step 3: Fallback to Gemini Vision if Tesseract failed
-        if not ocr_text and GEMINI_API_KEY:
-            try:
-                print("Falling back to Gemini Vision API for prescription...")
-                if ',' in image_data:
-                    header = image_data.split(',')[0]
-                    if 'png' in header.lower():
-                        mime_type = 'image/png'
-                    else:
-                        mime_type = 'image/jpeg'
-                else:
-                    mime_type = 'image/jpeg'
-                
-                prompt = """This is a medical prescription image. Please extract:
+@app.route('/api/medicines/ocr', methods=['POST'])
+def analyze_medicine_image():
+    """Analyze medicine image using Gemini Vision API (primary) + Tesseract OCR (fallback)"""
+    return handle_ocr_upload(read_medicine_image, lambda e: {
+        'success': False,
+        'error': str(e),
+        'ocrResult': None,
+        'medicines': []
+    })
+
+# Prescription results only list matched names, so return a small subset of each record
+PRESCRIPTION_MATCH_FIELDS = ('id', 'name', 'generic_name', 'price', 'prescription_required')
+
+def read_prescription_image(header, base64_data):
+    """Run prescription OCR (Tesseract + Gemini AI) and match each prescribed medicine against the dataset"""
+    mime_type = _sniff_mime(header)
+    cache_key = _ocr_cache_key('prescription', base64_data)
+    cached = _OCR_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    ocr_text = ""
+    prescription_info = None
+    ocr_method = "none"
+    
+    # Step 1: Try Tesseract OCR for prescription (with prescription-specific settings)
+    if TESSERACT_AVAILABLE:
+        try:
+            logger.debug("Attempting Tesseract OCR for prescription...")
+            ocr_text = extract_text_with_tesseract(base64_data, is_prescription=True)
+            ocr_method = "tesseract"
+            logger.debug("Tesseract OCR successful, extracted %d characters", len(ocr_text))
+        except Exception as e:
+            logger.warning("Tesseract OCR failed: %s", e)
+    
+    # Step 2: Use Gemini to extract prescription details
+    if ocr_text:
+        try:
+            logger.debug("Using Gemini to analyze prescription text...")
+            prescription_info = extract_medicine_name_with_gemini(ocr_text, is_prescription=True)
+            logger.debug("Gemini analysis complete: %s", prescription_info)
+        except Exception as e:
+            logger.warning("Gemini analysis failed: %s", e)
+            prescription_info = {
+                'medicines': [],
+                'doctorName': '',
+                'patientName': '',
+                'date': '',
+                'confidence': 'low'
+            }
+    
+    # Step 3: Fallback to Gemini Vision if Tesseract failed
+    if not ocr_text and GEMINI_API_KEY:
+        try:
+            logger.debug("Falling back to Gemini Vision API for prescription...")
+            prompt = """This is a medical prescription image. Please extract:
 1. ALL medicine names mentioned
 2. Dosage for each medicine
 3. Frequency (how often to take)
@@ -1910,74 +2782,95 @@ def analyze_prescription_image():
 7. Date of prescription
 
 Return the information in a structured format."""
-                
-                ocr_text = call_gemini_vision_api(prompt, base64_data, mime_type)
-                ocr_method = "gemini-vision"
-                
-                # Try to get Gemini to parse it
-                prescription_info = extract_medicine_name_with_gemini(ocr_text, is_prescription=True)
-                print(f"✓ Gemini Vision successful")
-            except Exception as e:
-                print(f"Gemini Vision also failed: {e}")
-        
-        if not prescription_info:
-            prescription_info = {
-                'medicines': [],
-                'doctorName': '',
-                'patientName': '',
-                'date': '',
-                'confidence': 'none'
-            }
-        
-        # Search for medicines in database
-        found_medicines = []
-        for med in prescription_info.get('medicines', []):
-            med_name = med.get('name', '')
-            if med_name:
-                search_results = search_medicines(med_name, limit=3)
-                if search_results:
-                    found_medicines.append({
-                        'prescribedName': med_name,
-                        'dosage': med.get('dosage', ''),
-                        'frequency': med.get('frequency', ''),
-                        'duration': med.get('duration', ''),
-                        'matchedMedicines': search_results
-                    })
-                else:
-                    # Try first word
-                    if ' ' in med_name:
-                        search_results = search_medicines(med_name.split()[0], limit=3)
-                    found_medicines.append({
-                        'prescribedName': med_name,
-                        'dosage': med.get('dosage', ''),
-                        'frequency': med.get('frequency', ''),
-                        'duration': med.get('duration', ''),
-                        'matchedMedicines': search_results or []
-                    })
-        
-        return jsonify({
-            'success': True,
-            'extractedText': ocr_text,
-            'ocrMethod': ocr_method,
-            'prescriptionData': {
-                'medicines': found_medicines,
-                'doctorName': prescription_info.get('doctorName', ''),
-                'patientName': prescription_info.get('patientName', ''),
-                'date': prescription_info.get('date', ''),
-                'confidence': prescription_info.get('confidence', 'medium'),
-                'rawMedicines': prescription_info.get('medicines', [])
-            }
+            
+            ocr_text = call_gemini_vision_api(prompt, base64_data, mime_type)
+            ocr_method = "gemini-vision"
+            
+            # Try to get Gemini to parse it
+            prescription_info = extract_medicine_name_with_gemini(ocr_text, is_prescription=True)
+            logger.debug("Gemini Vision successful")
+        except Exception as e:
+            logger.warning("Gemini Vision also failed: %s", e)
+    
+    if not prescription_info:
+        prescription_info = {
+            'medicines': [],
+            'doctorName': '',
+            'patientName': '',
+            'date': '',
+            'confidence': 'none'
+        }
+    
+    # Search for medicines in database, looking up each distinct name (and, for names
+    # with no match, their first word) once for the whole prescription
+    prescribed = [med for med in prescription_info.get('medicines', []) if med.get('name', '').strip()]
+    matches = search_medicine_names([med['name'] for med in prescribed], limit=3,
+                                    fields=PRESCRIPTION_MATCH_FIELDS)
+    first_word_matches = search_medicine_names(
+        [med['name'].split()[0] for med in prescribed if not matches[med['name']] and ' ' in med['name']],
+        limit=3,
+        fields=PRESCRIPTION_MATCH_FIELDS
+    )
+    found_medicines = []
+    for med in prescribed:
+        med_name = med['name']
+        search_results = matches[med_name]
+        if not search_results and ' ' in med_name:
+            # Try first word
+            search_results = first_word_matches[med_name.split()[0]]
+        found_medicines.append({
+            'prescribedName': med_name,
+            'dosage': med.get('dosage', ''),
+            'frequency': med.get('frequency', ''),
+            'duration': med.get('duration', ''),
+            'matchedMedicines': search_results
         })
-        
-    except Exception as e:
-        print(f"Prescription OCR Error: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            'success': False,
-            'error': str(e),
-            'prescriptionData': None
-        }), 500
+    
+    result = {
+        'success': True,
+        'extractedText': ocr_text,
+        'ocrMethod': ocr_method,
+        'prescriptionData': {
+            'medicines': found_medicines,
+            'doctorName': prescription_info.get('doctorName', ''),
+            'patientName': prescription_info.get('patientName', ''),
+            'date': prescription_info.get('date', ''),
+            'confidence': prescription_info.get('confidence', 'medium'),
+            'rawMedicines': prescription_info.get('medicines', [])
+        }
+    }
+    # Don't remember failed reads - the next attempt may succeed
+    if found_medicines:
+        _OCR_CACHE.put(cache_key, result)
+    return result
+
+@app.route('/api/prescriptions/ocr', methods=['POST'])
+def analyze_prescription_image():
+    """Analyze prescription image using Tesseract OCR + Gemini AI to extract medicine details"""
+    return handle_ocr_upload(read_prescription_image, lambda e: {
+        'success': False,
+        'error': str(e),
+        'prescriptionData': None
+    })
+
+@app.route('/api/ocr/status/<job_id>', methods=['GET'])
+def get_ocr_job_status(job_id):
+    """Poll a background OCR job; 'result' holds the OCR endpoint's response once it is done"""
+    job = get_ocr_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    
+    # Jobs live in the worker that accepted them, so one still pending long after any OCR run
+    # could finish was lost (e.g. to a worker restart); fail it rather than leave clients polling
+    cutoff = datetime.utcnow() - timedelta(seconds=OCR_JOB_TIMEOUT_SECONDS)
+    if job['status'] == 'pending' and job['createdAt'] < cutoff:
+        result = {'success': False, 'error': 'Image processing timed out. Please try again.'}
+        if fail_stale_ocr_job(job_id, cutoff, result):
+            job = {'status': 'failed', 'result': result}
+        else:
+            job = get_ocr_job(job_id) or job  # Finished in the meantime
+    
+    return jsonify({'jobId': job_id, 'status': job['status'], 'result': job.get('result')})
 
 # ==================== ERROR HANDLERS ====================
 
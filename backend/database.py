@@ -2,9 +2,20 @@
 MongoDB Database Configuration and Models
 """
 import os
-from datetime import datetime
-from pymongo import MongoClient, ASCENDING, DESCENDING
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+import time
+import uuid
+import hmac
+import base64
+import binascii
+import mimetypes
+from datetime import datetime, timedelta
+from collections import Counter
+import bcrypt
+import gridfs
+from pymongo import MongoClient, ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne, WriteConcern
+from pymongo.collation import Collation
+from pymongo.errors import BulkWriteError, ConnectionFailure, OperationFailure, PyMongoError, ServerSelectionTimeoutError
+from bson.errors import InvalidId
 from bson.objectid import ObjectId
 from dotenv import load_dotenv
 
@@ -13,6 +24,41 @@ load_dotenv()
 
 # MongoDB Configuration
 MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/healthcare_db')
+# Used when the URI does not name a database
+DEFAULT_DB_NAME = 'healthcare_db'
+
+# One client per worker process is shared by every request thread, so size its pool for
+# Gunicorn's request threads plus the background notification pool
+MONGODB_MAX_POOL_SIZE = int(os.getenv('MONGODB_MAX_POOL_SIZE', 50))
+
+# Wire compression for large result sets; zstd and snappy need the optional zstandard and
+# python-snappy packages, zlib is always available
+_compressors = []
+try:
+    import zstandard  # noqa: F401
+    _compressors.append('zstd')
+except ImportError:
+    pass
+try:
+    import snappy  # noqa: F401
+    _compressors.append('snappy')
+except ImportError:
+    pass
+MONGODB_COMPRESSORS = ','.join(_compressors + ['zlib'])
+
+# Emails are compared case-insensitively (strength 2 ignores case but not accents)
+EMAIL_COLLATION = Collation(locale='en', strength=2)
+
+# AI-generated medicine usages are effectively static, so keep them for 30 days
+USAGES_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+# Background OCR jobs only need to outlive the client polling for them
+OCR_JOB_TTL_SECONDS = 60 * 60
+# Read notifications are kept for 30 days after being read, then removed
+READ_NOTIFICATION_TTL_SECONDS = 30 * 24 * 60 * 60
+# Unread notification counters are recounted this often to correct any drift
+UNREAD_COUNT_RECONCILE_SECONDS = 10 * 60
+# Doctor accounts change rarely, so notification fan-out reuses the recipient list this long
+DOCTOR_RECIPIENTS_TTL_SECONDS = 60
 
 class Database:
     """MongoDB Database Manager"""
@@ -20,6 +66,20 @@ class Database:
     def __init__(self):
         self.client = None
         self.db = None
+        self.fs = None
+        # Collection handles, bound once on connect
+        self.users = None
+        self.orders = None
+        self.consultations = None
+        self.prescriptions = None
+        self.notifications = None
+        self.counters = None
+        self.usages_cache = None
+        self.ocr_jobs = None
+        self.unread_counts = None
+        # Notification inserts are fire-and-forget (w=0): losing one is harmless and nothing
+        # waits on the result
+        self.notification_writes = None
         self.connected = False
         
     def connect(self):
@@ -30,23 +90,36 @@ class Database:
                 MONGODB_URI,
                 serverSelectionTimeoutMS=5000,
                 connectTimeoutMS=5000,
-                socketTimeoutMS=5000
+                socketTimeoutMS=5000,
+                maxPoolSize=MONGODB_MAX_POOL_SIZE,
+                minPoolSize=5,
+                maxIdleTimeMS=60000,
+                retryWrites=True,
+                compressors=MONGODB_COMPRESSORS
             )
             
             # Test connection
             self.client.admin.command('ping')
             
-            # Get database name from URI or use default
-            if '/' in MONGODB_URI.split('://')[-1]:
-                db_name = MONGODB_URI.split('/')[-1].split('?')[0]
-            else:
-                db_name = 'healthcare_db'
-            
-            self.db = self.client[db_name]
+            # Database named in the URI (as the client already parsed it), or the default
+            self.db = self.client.get_default_database(DEFAULT_DB_NAME)
+            db_name = self.db.name
+            self.fs = gridfs.GridFS(self.db)
+            self.users = self.db.users
+            self.orders = self.db.orders
+            self.consultations = self.db.consultations
+            self.prescriptions = self.db.prescriptions
+            self.notifications = self.db.notifications
+            self.counters = self.db.counters
+            self.usages_cache = self.db.usages_cache
+            self.ocr_jobs = self.db.ocr_jobs
+            self.unread_counts = self.db.unread_counts
+            self.notification_writes = self.notifications.with_options(write_concern=WriteConcern(w=0))
             self.connected = True
             
             # Create indexes
             self._create_indexes()
+            self._init_counters()
             
             print(f"✓ MongoDB connected successfully to database: {db_name}")
             return True
@@ -67,34 +140,108 @@ class Database:
     
     def _create_indexes(self):
         """Create database indexes for better performance"""
+        # Drop superseded indexes first. Every listing filters by user or status first, so the
+        # compound indexes below cover the old standalone timestamp indexes, and the old
+        # single-field userId/status indexes are prefixes of those compounds; notification reads
+        # always filter by user, so a lone read index is never chosen; the full
+        # (userId, read, createdAt) index is replaced by a partial one over unread notifications
         try:
-            # Users collection indexes
-            self.db.users.create_index([("email", ASCENDING)], unique=True)
-            self.db.users.create_index([("type", ASCENDING)])
-            
-            # Orders collection indexes
-            self.db.orders.create_index([("userId", ASCENDING)])
-            self.db.orders.create_index([("status", ASCENDING)])
-            self.db.orders.create_index([("createdAt", DESCENDING)])
-            
-            # Consultations collection indexes
-            self.db.consultations.create_index([("userId", ASCENDING)])
-            self.db.consultations.create_index([("status", ASCENDING)])
-            self.db.consultations.create_index([("createdAt", DESCENDING)])
-            self.db.consultations.create_index([("orderId", ASCENDING)])
-            
-            # Prescriptions collection indexes
-            self.db.prescriptions.create_index([("userId", ASCENDING)])
-            self.db.prescriptions.create_index([("uploadDate", DESCENDING)])
-            
-            # Notifications collection indexes
-            self.db.notifications.create_index([("userId", ASCENDING)])
-            self.db.notifications.create_index([("read", ASCENDING)])
-            self.db.notifications.create_index([("createdAt", DESCENDING)])
-            
+            for collection, index_name in [("orders", "createdAt_-1"), ("consultations", "createdAt_-1"),
+                                           ("prescriptions", "uploadDate_-1"), ("notifications", "createdAt_-1"),
+                                           ("orders", "userId_1"), ("consultations", "userId_1"),
+                                           ("prescriptions", "userId_1"), ("notifications", "userId_1"),
+                                           ("consultations", "status_1"),
+                                           ("notifications", "read_1"),
+                                           ("notifications", "userId_1_read_1_createdAt_-1")]:
+                try:
+                    self.db[collection].drop_index(index_name)
+                except OperationFailure:
+                    pass  # Already dropped (or never created)
+        except Exception as e:
+            print(f"Warning: Could not drop superseded indexes: {e}")
+        
+        indexes = {
+            self.users: [
+                IndexModel([("email", ASCENDING)], unique=True),
+                IndexModel([("type", ASCENDING)]),
+                # Admin review list: doctors filtered by registration status
+                IndexModel([("type", ASCENDING), ("registrationStatus", ASCENDING)],
+                           partialFilterExpression={"type": "doctor"}),
+            ],
+            # (userId, createdAt) serves "orders for a user, newest first" without an in-memory sort
+            self.orders: [
+                IndexModel([("userId", ASCENDING), ("createdAt", DESCENDING)]),
+                IndexModel([("status", ASCENDING)]),
+            ],
+            self.consultations: [
+                IndexModel([("userId", ASCENDING), ("createdAt", DESCENDING)]),
+                # Pending queue, oldest first
+                IndexModel([("status", ASCENDING), ("createdAt", ASCENDING)]),
+                IndexModel([("orderId", ASCENDING)]),
+            ],
+            self.prescriptions: [
+                IndexModel([("userId", ASCENDING), ("uploadDate", DESCENDING)]),
+            ],
+            # (userId, createdAt) serves the full list; the unread list and the unread count seed
+            # only touch unread notifications, so their index holds just those. Read
+            # notifications expire after READ_NOTIFICATION_TTL_SECONDS
+            self.notifications: [
+                IndexModel([("userId", ASCENDING), ("createdAt", DESCENDING)]),
+                IndexModel([("userId", ASCENDING), ("read", ASCENDING), ("createdAt", DESCENDING)],
+                           name="userId_1_read_1_createdAt_-1_unread", partialFilterExpression={"read": False}),
+                IndexModel([("readAt", ASCENDING)], expireAfterSeconds=READ_NOTIFICATION_TTL_SECONDS,
+                           partialFilterExpression={"read": True}),
+            ],
+            # Medicine usages cache and OCR jobs expire entries automatically
+            self.usages_cache: [
+                IndexModel([("createdAt", ASCENDING)], expireAfterSeconds=USAGES_CACHE_TTL_SECONDS),
+            ],
+            self.ocr_jobs: [
+                IndexModel([("createdAt", ASCENDING)], expireAfterSeconds=OCR_JOB_TTL_SECONDS),
+            ],
+        }
+        
+        # One createIndexes command per collection, each on its own so a conflicting existing
+        # index cannot keep another collection (e.g. the TTL ones) from getting its indexes
+        created = True
+        for collection, models in indexes.items():
+            try:
+                collection.create_indexes(models)
+            except OperationFailure:
+                # The command is all-or-nothing; retry one by one so only the conflicting index is skipped
+                for model in models:
+                    try:
+                        collection.create_indexes([model])
+                    except Exception as e:
+                        created = False
+                        print(f"Warning: Could not create index {model.document['name']} on {collection.name}: {e}")
+            except Exception as e:
+                created = False
+                print(f"Warning: Could not create indexes on {collection.name}: {e}")
+        if created:
             print("✓ Database indexes created")
+        
+        # Separate so existing emails differing only in case can't block the other indexes
+        try:
+            self.db.users.create_index([("email", ASCENDING)], name="email_ci", unique=True,
+                                       collation=EMAIL_COLLATION)
+        except Exception as e:
+            print(f"Warning: Could not create case-insensitive email index: {e}")
+    
+    def _init_counters(self):
+        """Seed the ID sequence counters from existing documents the first time they are used"""
+        try:
+            seeds = {
+                'orders': lambda: self.db.orders.count_documents({}),
+                'patients': lambda: self.db.users.count_documents({'type': 'patient'}),
+                'consultations': lambda: self.db.consultations.count_documents({}),
+                'prescriptions': lambda: self.db.prescriptions.count_documents({}),
+            }
+            for name, count in seeds.items():
+                if self.db.counters.find_one({'_id': name}, {'_id': 1}) is None:
+                    self.db.counters.update_one({'_id': name}, {'$setOnInsert': {'seq': count()}}, upsert=True)
         except Exception as e:
-            print(f"Warning: Could not create indexes: {e}")
+            print(f"Warning: Could not initialize counters: {e}")
     
     def close(self):
         """Close MongoDB connection"""
@@ -110,24 +257,175 @@ class Database:
 # Global database instance
 db = Database()
 
+# Password hashing
+
+# bcrypt work factor: slow enough to make brute force expensive, fast enough for login
+BCRYPT_ROUNDS = 12
+
+def hash_password(password):
+    """Hash a password with bcrypt, returning the hash as a string"""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+def is_password_hash(stored):
+    """Check whether a stored password is a bcrypt hash (older accounts stored plaintext)"""
+    return isinstance(stored, str) and stored.startswith(('$2a$', '$2b$', '$2y$'))
+
+def verify_password(password, stored):
+    """Check a password against a stored bcrypt hash or legacy plaintext value in constant time"""
+    if not password or not stored:
+        return False
+    if is_password_hash(stored):
+        return bcrypt.checkpw(password.encode('utf-8'), stored.encode('utf-8'))
+    return hmac.compare_digest(password.encode('utf-8'), str(stored).encode('utf-8'))
+
 # Collection helper functions
 
+# Users keep only a GridFS reference to their license certificate; never load a legacy inline copy
+USER_PROJECTION = {'licenseCertificate': 0}
+
+def to_object_id(value):
+    """Parse value as an ObjectId, or return None if it is not one (one parse instead of is_valid + ObjectId)"""
+    if value is None:
+        return None  # ObjectId(None) would generate a new id
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+def _oid_to_str(oid):
+    """Hex string for a document _id; reads ObjectId bytes directly instead of going through str()"""
+    return oid.binary.hex() if isinstance(oid, ObjectId) else str(oid)
+
+def _find_with_string_ids(collection, query, fields, sort_field, direction, limit):
+    """Run a sorted, limited find whose documents come back with _id already a hex string
+
+    The server converts the ids ($toString), so list results skip a per-document pass in Python.
+    """
+    pipeline = [{"$match": query}, {"$sort": {sort_field: direction}}]
+    # Like find().limit(): 0 means no limit and a negative limit is its absolute value
+    limit = abs(limit)
+    if limit:
+        pipeline.append({"$limit": limit})
+    if fields:
+        pipeline.append({"$project": fields})
+    pipeline.append({"$set": {"_id": {"$toString": "$_id"}}})
+    # Ask for the whole page in the first batch so no getMore round trip follows
+    return list(collection.aggregate(pipeline, batchSize=limit) if limit else collection.aggregate(pipeline))
+
+def next_sequence(name):
+    """Atomically increment and return the named ID counter"""
+    counter = db.counters.find_one_and_update(
+        {'_id': name},
+        {'$inc': {'seq': 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return counter['seq']
+
+# Medicine usages cache
+
+def get_cached_usages(key):
+    """Get cached AI medicine usages by key, or None on a miss"""
+    if not db.connected:
+        return None
+    try:
+        cached = db.usages_cache.find_one({"_id": key}, {"data": 1})
+        return cached["data"] if cached else None
+    except Exception as e:
+        print(f"Warning: Could not read usages cache: {e}")
+        return None
+
+def cache_usages(key, data):
+    """Store AI medicine usages under key; the TTL index expires them"""
+    if not db.connected:
+        return
+    try:
+        db.usages_cache.replace_one(
+            {"_id": key},
+            {"data": data, "createdAt": datetime.utcnow()},
+            upsert=True
+        )
+    except Exception as e:
+        print(f"Warning: Could not write usages cache: {e}")
+
+# Background OCR jobs (shared through MongoDB so any worker process can answer a status poll)
+
+def create_ocr_job():
+    """Record a new pending OCR job and return its id"""
+    job_id = uuid.uuid4().hex
+    db.ocr_jobs.insert_one({"_id": job_id, "status": "pending", "createdAt": datetime.utcnow()})
+    return job_id
+
+def finish_ocr_job(job_id, status, result):
+    """Store the final status ('done' or 'failed') and response body of an OCR job"""
+    db.ocr_jobs.update_one({"_id": job_id}, {"$set": {"status": status, "result": result}})
+
+def get_ocr_job(job_id):
+    """Get an OCR job's status, result and creation time, or None if it is unknown or expired"""
+    if not db.connected:
+        return None
+    return db.ocr_jobs.find_one({"_id": job_id}, {"status": 1, "result": 1, "createdAt": 1})
+
+def fail_stale_ocr_job(job_id, created_before, result):
+    """Mark a job that is still pending but was created before created_before as failed
+    (its worker was likely restarted); returns whether it was"""
+    outcome = db.ocr_jobs.update_one(
+        {"_id": job_id, "status": "pending", "createdAt": {"$lt": created_before}},
+        {"$set": {"status": "failed", "result": result}}
+    )
+    return outcome.modified_count == 1
+
+# License certificates (GridFS)
+
+def decode_certificate(certificate, filename=''):
+    """Decode an uploaded certificate (data URL or bare base64) to (bytes, content type)
+
+    Values that are not valid base64 are kept as their raw text rather than rejected.
+    """
+    content_type = mimetypes.guess_type(filename)[0] or 'application/pdf'
+    if certificate.startswith('data:'):
+        header, _, certificate = certificate.partition(',')
+        content_type = header[5:].split(';')[0] or content_type
+    try:
+        return base64.b64decode(certificate, validate=True), content_type
+    except (binascii.Error, ValueError):
+        return certificate.encode('utf-8'), 'application/octet-stream'
+
+def store_license_certificate(certificate, filename):
+    """Store an uploaded license certificate in GridFS and return its file id"""
+    content, content_type = decode_certificate(certificate, filename)
+    return db.fs.put(content, filename=filename, contentType=content_type)
+
+def open_license_certificate(file_id):
+    """Open a stored license certificate for streaming, or None if it does not exist"""
+    try:
+        return db.fs.get(file_id)
+    except gridfs.errors.NoFile:
+        return None
+
+def delete_license_certificate(file_id):
+    """Remove a stored license certificate, e.g. when its registration was rejected as a duplicate"""
+    db.fs.delete(file_id)
+
 def get_user_by_email(email):
     """Get user by email"""
     if not db.connected:
         return None
-    return db.db.users.find_one({"email": email})
+    return db.users.find_one({"email": email}, USER_PROJECTION, collation=EMAIL_COLLATION)
 
 def create_user(user_data):
     """Create a new user"""
     if not db.connected:
         return None
     
-    user_data['createdAt'] = datetime.utcnow()
-    user_data['updatedAt'] = datetime.utcnow()
+    now = datetime.utcnow()
+    user_data['createdAt'] = now
+    user_data['updatedAt'] = now
     
-    result = db.db.users.insert_one(user_data)
-    user_data['_id'] = str(result.inserted_id)
+    result = db.users.insert_one(user_data)
+    if user_data.get('type') == 'doctor':
+        invalidate_doctor_recipients()
+    user_data['_id'] = _oid_to_str(result.inserted_id)
     return user_data
 
 def get_user_by_id(user_id):
@@ -136,13 +434,34 @@ def get_user_by_id(user_id):
         return None
     
     try:
-        if isinstance(user_id, str) and ObjectId.is_valid(user_id):
-            return db.db.users.find_one({"_id": ObjectId(user_id)})
-        else:
-            return db.db.users.find_one({"id": user_id})
-    except:
+        oid = to_object_id(user_id) if isinstance(user_id, str) else None
+        return db.users.find_one({"_id": oid} if oid else {"id": user_id}, USER_PROJECTION)
+    except PyMongoError:
         return None
 
+def get_users_by_ids(user_ids, projection=None):
+    """Get several users in one query, returned as {user_id: user} for the ids that exist
+
+    Accepts the same ids as get_user_by_id (ObjectId strings or app-level 'id' values).
+    """
+    user_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id]
+    if not db.connected or not user_ids:
+        return {}
+    
+    object_ids = [oid for oid in (to_object_id(user_id) for user_id in user_ids if isinstance(user_id, str)) if oid]
+    users = db.users.find(
+        {"$or": [{"_id": {"$in": object_ids}}, {"id": {"$in": user_ids}}]},
+        {**projection, "id": 1} if projection else USER_PROJECTION
+    )
+    
+    found = {}
+    for user in users:
+        # Keep the first match per id, like find_one
+        found.setdefault(_oid_to_str(user['_id']), user)
+        if user.get('id') is not None:
+            found.setdefault(user['id'], user)
+    return {user_id: found[user_id] for user_id in user_ids if user_id in found}
+
 # Orders collection functions
 
 def create_order(order_data):
@@ -150,27 +469,40 @@ def create_order(order_data):
     if not db.connected:
         return None
     
-    order_data['createdAt'] = datetime.utcnow()
-    order_data['updatedAt'] = datetime.utcnow()
+    now = datetime.utcnow()
+    order_data['createdAt'] = now
+    order_data['updatedAt'] = now
     
-    result = db.db.orders.insert_one(order_data)
-    order_data['_id'] = str(result.inserted_id)
+    result = db.orders.insert_one(order_data)
+    order_data['_id'] = _oid_to_str(result.inserted_id)
     return order_data
 
-def get_orders_by_user(user_id, limit=50):
-    """Get orders by user ID"""
-    if not db.connected:
+def _insert_many_timestamped(collection, documents):
+    """Insert documents with one unordered insert_many, stamping them like the single-document create helpers"""
+    if not db.connected or not documents:
         return []
     
-    orders = list(db.db.orders.find(
-        {"userId": user_id}
-    ).sort("createdAt", DESCENDING).limit(limit))
+    now = datetime.utcnow()
+    for document in documents:
+        document['createdAt'] = now
+        document['updatedAt'] = now
     
-    # Convert ObjectId to string
-    for order in orders:
-        order['_id'] = str(order['_id'])
+    # insert_many fills in each document's _id
+    collection.insert_many(documents, ordered=False)
+    for document in documents:
+        document['_id'] = _oid_to_str(document['_id'])
+    return documents
+
+def create_orders_bulk(orders):
+    """Create several orders with a single insert"""
+    return _insert_many_timestamped(db.orders, orders)
+
+def get_orders_by_user(user_id, limit=50, fields=None):
+    """Get orders by user ID, optionally projected to the given fields"""
+    if not db.connected:
+        return []
     
-    return orders
+    return _find_with_string_ids(db.orders, {"userId": user_id}, fields, "createdAt", DESCENDING, limit)
 
 def get_order_by_id(order_id):
     """Get order by ID"""
@@ -178,42 +510,35 @@ def get_order_by_id(order_id):
         return None
     
     try:
-        if ObjectId.is_valid(order_id):
-            order = db.db.orders.find_one({"_id": ObjectId(order_id)})
-        else:
-            order = db.db.orders.find_one({"id": order_id})
+        oid = to_object_id(order_id)
+        order = db.orders.find_one({"_id": oid} if oid else {"id": order_id})
         
         if order:
-            order['_id'] = str(order['_id'])
+            order['_id'] = _oid_to_str(order['_id'])
         return order
-    except:
+    except PyMongoError:
         return None
 
-def update_order(order_id, update_data):
-    """Update an order"""
+def update_order(order_id, update_data, fields=None):
+    """Update an order, returning the updated document (optionally projected to the given fields)"""
     if not db.connected:
         return None
     
     update_data['updatedAt'] = datetime.utcnow()
     
     try:
-        if ObjectId.is_valid(order_id):
-            result = db.db.orders.find_one_and_update(
-                {"_id": ObjectId(order_id)},
-                {"$set": update_data},
-                return_document=True
-            )
-        else:
-            result = db.db.orders.find_one_and_update(
-                {"id": order_id},
-                {"$set": update_data},
-                return_document=True
-            )
+        oid = to_object_id(order_id)
+        result = db.orders.find_one_and_update(
+            {"_id": oid} if oid else {"id": order_id},
+            {"$set": update_data},
+            projection=fields,
+            return_document=ReturnDocument.AFTER
+        )
         
         if result:
-            result['_id'] = str(result['_id'])
+            result['_id'] = _oid_to_str(result['_id'])
         return result
-    except:
+    except PyMongoError:
         return None
 
 # Consultations collection functions
@@ -223,40 +548,31 @@ def create_consultation(consultation_data):
     if not db.connected:
         return None
     
-    consultation_data['createdAt'] = datetime.utcnow()
-    consultation_data['updatedAt'] = datetime.utcnow()
+    now = datetime.utcnow()
+    consultation_data['createdAt'] = now
+    consultation_data['updatedAt'] = now
     
-    result = db.db.consultations.insert_one(consultation_data)
-    consultation_data['_id'] = str(result.inserted_id)
+    result = db.consultations.insert_one(consultation_data)
+    consultation_data['_id'] = _oid_to_str(result.inserted_id)
     return consultation_data
 
-def get_consultations_by_user(user_id, limit=50):
-    """Get consultations by user ID"""
+def create_consultations_bulk(consultations):
+    """Create several consultations with a single insert"""
+    return _insert_many_timestamped(db.consultations, consultations)
+
+def get_consultations_by_user(user_id, limit=50, fields=None):
+    """Get consultations by user ID, optionally projected to the given fields"""
     if not db.connected:
         return []
     
-    consultations = list(db.db.consultations.find(
-        {"userId": user_id}
-    ).sort("createdAt", DESCENDING).limit(limit))
-    
-    for consultation in consultations:
-        consultation['_id'] = str(consultation['_id'])
-    
-    return consultations
+    return _find_with_string_ids(db.consultations, {"userId": user_id}, fields, "createdAt", DESCENDING, limit)
 
 def get_pending_consultations(limit=50):
     """Get all pending consultations"""
     if not db.connected:
         return []
     
-    consultations = list(db.db.consultations.find(
-        {"status": "pending"}
-    ).sort("createdAt", ASCENDING).limit(limit))
-    
-    for consultation in consultations:
-        consultation['_id'] = str(consultation['_id'])
-    
-    return consultations
+    return _find_with_string_ids(db.consultations, {"status": "pending"}, None, "createdAt", ASCENDING, limit)
 
 def get_consultation_by_id(consultation_id):
     """Get consultation by ID"""
@@ -264,42 +580,35 @@ def get_consultation_by_id(consultation_id):
         return None
     
     try:
-        if ObjectId.is_valid(consultation_id):
-            consultation = db.db.consultations.find_one({"_id": ObjectId(consultation_id)})
-        else:
-            consultation = db.db.consultations.find_one({"id": consultation_id})
+        oid = to_object_id(consultation_id)
+        consultation = db.consultations.find_one({"_id": oid} if oid else {"id": consultation_id})
         
         if consultation:
-            consultation['_id'] = str(consultation['_id'])
+            consultation['_id'] = _oid_to_str(consultation['_id'])
         return consultation
-    except:
+    except PyMongoError:
         return None
 
-def update_consultation(consultation_id, update_data):
-    """Update a consultation"""
+def update_consultation(consultation_id, update_data, fields=None):
+    """Update a consultation, returning the updated document (optionally projected to the given fields)"""
     if not db.connected:
         return None
     
     update_data['updatedAt'] = datetime.utcnow()
     
     try:
-        if ObjectId.is_valid(consultation_id):
-            result = db.db.consultations.find_one_and_update(
-                {"_id": ObjectId(consultation_id)},
-                {"$set": update_data},
-                return_document=True
-            )
-        else:
-            result = db.db.consultations.find_one_and_update(
-                {"id": consultation_id},
-                {"$set": update_data},
-                return_document=True
-            )
+        oid = to_object_id(consultation_id)
+        result = db.consultations.find_one_and_update(
+            {"_id": oid} if oid else {"id": consultation_id},
+            {"$set": update_data},
+            projection=fields,
+            return_document=ReturnDocument.AFTER
+        )
         
         if result:
-            result['_id'] = str(result['_id'])
+            result['_id'] = _oid_to_str(result['_id'])
         return result
-    except:
+    except PyMongoError:
         return None
 
 # Prescriptions collection functions
@@ -309,26 +618,20 @@ def create_prescription(prescription_data):
     if not db.connected:
         return None
     
-    prescription_data['uploadDate'] = datetime.utcnow()
-    prescription_data['createdAt'] = datetime.utcnow()
+    now = datetime.utcnow()
+    prescription_data['uploadDate'] = now
+    prescription_data['createdAt'] = now
     
-    result = db.db.prescriptions.insert_one(prescription_data)
-    prescription_data['_id'] = str(result.inserted_id)
+    result = db.prescriptions.insert_one(prescription_data)
+    prescription_data['_id'] = _oid_to_str(result.inserted_id)
     return prescription_data
 
-def get_prescriptions_by_user(user_id, limit=50):
-    """Get prescriptions by user ID"""
+def get_prescriptions_by_user(user_id, limit=50, fields=None):
+    """Get prescriptions by user ID, optionally projected to the given fields"""
     if not db.connected:
         return []
     
-    prescriptions = list(db.db.prescriptions.find(
-        {"userId": user_id}
-    ).sort("uploadDate", DESCENDING).limit(limit))
-    
-    for prescription in prescriptions:
-        prescription['_id'] = str(prescription['_id'])
-    
-    return prescriptions
+    return _find_with_string_ids(db.prescriptions, {"userId": user_id}, fields, "uploadDate", DESCENDING, limit)
 
 def get_prescription_by_id(prescription_id):
     """Get prescription by ID"""
@@ -336,42 +639,35 @@ def get_prescription_by_id(prescription_id):
         return None
     
     try:
-        if ObjectId.is_valid(prescription_id):
-            prescription = db.db.prescriptions.find_one({"_id": ObjectId(prescription_id)})
-        else:
-            prescription = db.db.prescriptions.find_one({"id": prescription_id})
+        oid = to_object_id(prescription_id)
+        prescription = db.prescriptions.find_one({"_id": oid} if oid else {"id": prescription_id})
         
         if prescription:
-            prescription['_id'] = str(prescription['_id'])
+            prescription['_id'] = _oid_to_str(prescription['_id'])
         return prescription
-    except:
+    except PyMongoError:
         return None
 
-def update_prescription(prescription_id, update_data):
-    """Update a prescription"""
+def update_prescription(prescription_id, update_data, fields=None):
+    """Update a prescription, returning the updated document (optionally projected to the given fields)"""
     if not db.connected:
         return None
     
     update_data['updatedAt'] = datetime.utcnow()
     
     try:
-        if ObjectId.is_valid(prescription_id):
-            result = db.db.prescriptions.find_one_and_update(
-                {"_id": ObjectId(prescription_id)},
-                {"$set": update_data},
-                return_document=True
-            )
-        else:
-            result = db.db.prescriptions.find_one_and_update(
-                {"id": prescription_id},
-                {"$set": update_data},
-                return_document=True
-            )
+        oid = to_object_id(prescription_id)
+        result = db.prescriptions.find_one_and_update(
+            {"_id": oid} if oid else {"id": prescription_id},
+            {"$set": update_data},
+            projection=fields,
+            return_document=ReturnDocument.AFTER
+        )
         
         if result:
-            result['_id'] = str(result['_id'])
+            result['_id'] = _oid_to_str(result['_id'])
         return result
-    except:
+    except PyMongoError:
         return None
 
 # Initialize demo users on first run
@@ -386,12 +682,34 @@ def create_notification(notification_data):
     notification_data['createdAt'] = datetime.utcnow()
     notification_data['read'] = False
     
-    result = db.db.notifications.insert_one(notification_data)
-    notification_data['_id'] = str(result.inserted_id)
+    result = db.notification_writes.insert_one(notification_data)
+    db.unread_counts.update_one({"_id": notification_data.get('userId')}, {"$inc": {"unread": 1}}, upsert=True)
+    notification_data['_id'] = _oid_to_str(result.inserted_id)
     return notification_data
 
-def get_user_notifications(user_id, limit=50, unread_only=False):
-    """Get notifications for a user"""
+def create_many_notifications(notifications):
+    """Create several notifications with a single insert"""
+    if not db.connected or not notifications:
+        return []
+    
+    now = datetime.utcnow()
+    for notification_data in notifications:
+        notification_data['createdAt'] = now
+        notification_data['read'] = False
+    
+    # insert_many fills in each document's _id
+    db.notification_writes.insert_many(notifications, ordered=False)
+    added = Counter(notification_data.get('userId') for notification_data in notifications)
+    db.unread_counts.bulk_write(
+        [UpdateOne({"_id": user_id}, {"$inc": {"unread": count}}, upsert=True) for user_id, count in added.items()],
+        ordered=False
+    )
+    for notification_data in notifications:
+        notification_data['_id'] = _oid_to_str(notification_data['_id'])
+    return notifications
+
+def get_user_notifications(user_id, limit=50, unread_only=False, fields=None):
+    """Get notifications for a user, optionally projected to the given fields"""
     if not db.connected:
         return []
     
@@ -399,36 +717,34 @@ def get_user_notifications(user_id, limit=50, unread_only=False):
     if unread_only:
         query["read"] = False
     
-    notifications = list(db.db.notifications.find(query).sort("createdAt", DESCENDING).limit(limit))
-    
-    for notification in notifications:
-        notification['_id'] = str(notification['_id'])
-    
-    return notifications
+    return _find_with_string_ids(db.notifications, query, fields, "createdAt", DESCENDING, limit)
 
-def mark_notification_read(notification_id):
-    """Mark a notification as read"""
+def mark_notification_read(notification_id, fields=None):
+    """Mark a notification as read, returning it (optionally projected to the given fields)"""
     if not db.connected:
         return None
     
     try:
-        if ObjectId.is_valid(notification_id):
-            result = db.db.notifications.find_one_and_update(
-                {"_id": ObjectId(notification_id)},
-                {"$set": {"read": True, "readAt": datetime.utcnow()}},
-                return_document=True
-            )
+        oid = to_object_id(notification_id)
+        query = {"_id": oid} if oid else {"id": notification_id}
+        # Only an unread notification changes, so the unread counter moves exactly once
+        result = db.notifications.find_one_and_update(
+            {**query, "read": False},
+            {"$set": {"read": True, "readAt": datetime.utcnow()}},
+            projection={**fields, "userId": 1} if fields else None,
+            return_document=ReturnDocument.AFTER
+        )
+        
+        if result:
+            db.unread_counts.update_one({"_id": result.get('userId'), "unread": {"$gt": 0}}, {"$inc": {"unread": -1}})
         else:
-            result = db.db.notifications.find_one_and_update(
-                {"id": notification_id},
-                {"$set": {"read": True, "readAt": datetime.utcnow()}},
-                return_document=True
-            )
+            # Already read (or missing)
+            result = db.notifications.find_one(query, fields)
         
         if result:
-            result['_id'] = str(result['_id'])
+            result['_id'] = _oid_to_str(result['_id'])
         return result
-    except:
+    except PyMongoError:
         return None
 
 def mark_all_notifications_read(user_id):
@@ -437,38 +753,66 @@ def mark_all_notifications_read(user_id):
         return False
     
     try:
-        db.db.notifications.update_many(
+        result = db.notifications.update_many(
             {"userId": user_id, "read": False},
             {"$set": {"read": True, "readAt": datetime.utcnow()}}
         )
+        # Take off only what was marked, so a notification created meanwhile stays counted
+        if result.modified_count:
+            db.unread_counts.update_one({"_id": user_id}, {"$inc": {"unread": -result.modified_count}})
         return True
-    except:
+    except PyMongoError:
         return False
 
 def get_unread_count(user_id):
-    """Get count of unread notifications for a user"""
+    """Get count of unread notifications for a user
+    
+    Read from a per-user counter that notification writes keep up to date. The counter is
+    recounted from the notifications themselves when it has never been, or was last
+    reconciled over UNREAD_COUNT_RECONCILE_SECONDS ago, which corrects any drift (e.g. a lost
+    unacknowledged insert, or a notification created while the counter was being recounted).
+    """
     if not db.connected:
         return 0
     
-    return db.db.notifications.count_documents({"userId": user_id, "read": False})
+    now = datetime.utcnow()
+    counter = db.unread_counts.find_one({"_id": user_id}, {"unread": 1, "reconciledAt": 1})
+    if counter and counter.get('reconciledAt') and counter['reconciledAt'] > now - timedelta(seconds=UNREAD_COUNT_RECONCILE_SECONDS):
+        return max(counter.get('unread', 0), 0)
+    
+    count = db.notifications.count_documents({"userId": user_id, "read": False})
+    db.unread_counts.update_one({"_id": user_id}, {"$set": {"unread": count, "reconciledAt": now}}, upsert=True)
+    return count
+
+# (expires at, notification user ids of all doctors), replaced as a whole so threads never see a partial list
+_doctor_recipients = (0, [])
+
+def get_doctor_recipient_ids():
+    """Get the notification user id of every doctor, cached for DOCTOR_RECIPIENTS_TTL_SECONDS"""
+    global _doctor_recipients
+    expires_at, user_ids = _doctor_recipients
+    if time.monotonic() < expires_at:
+        return user_ids
+    
+    doctors = db.users.find({"type": "doctor"}, {"id": 1, "email": 1, "_id": 0})
+    user_ids = [doctor.get('id') or doctor.get('email') for doctor in doctors]
+    _doctor_recipients = (time.monotonic() + DOCTOR_RECIPIENTS_TTL_SECONDS, user_ids)
+    return user_ids
+
+def invalidate_doctor_recipients():
+    """Drop the cached doctor list, e.g. after a doctor account is created"""
+    global _doctor_recipients
+    _doctor_recipients = (0, [])
 
 def notify_doctors(notification_data):
     """Send notification to all doctors"""
     if not db.connected:
         return []
     
-    # Find all active doctors
-    doctors = list(db.db.users.find({"type": "doctor"}))
-    
-    created_notifications = []
-    for doctor in doctors:
-        doctor_notification = notification_data.copy()
-        doctor_notification['userId'] = doctor.get('id') or doctor.get('email')
-        notification = create_notification(doctor_notification)
-        if notification:
-            created_notifications.append(notification)
-    
-    return created_notifications
+    return create_many_notifications([
+        {**notification_data, 'userId': user_id}
+        for user_id in get_doctor_recipient_ids()
+    ])
 
 def initialize_demo_users():
     """Initialize demo users if they don't exist"""
@@ -480,7 +824,7 @@ def initialize_demo_users():
             'id': '1',
             'name': 'John Doe',
             'email': 'patient@demo.com',
-            'password': 'patient123',  # In production, hash this!
+            'password': 'patient123',
             'type': 'patient',
             'phone': '+91 98765 43210'
         },
@@ -512,11 +856,31 @@ def initialize_demo_users():
         }
     ]
     
-    for user in demo_users:
-        existing = get_user_by_email(user['email'])
-        if not existing:
-            try:
-                create_user(user)
-                print(f"✓ Created demo user: {user['email']}")
-            except Exception as e:
-                print(f"  Note: Demo user {user['email']} may already exist")
+    # One query for which demo users exist, one insert for the rest
+    existing = {
+        user['email'].lower()
+        for user in db.users.find({"email": {"$in": [user['email'] for user in demo_users]}},
+                                     {"email": 1}, collation=EMAIL_COLLATION)
+    }
+    missing = [user for user in demo_users if user['email'] not in existing]
+    if not missing:
+        return
+    
+    # Store bcrypt hashes, hashing each distinct demo password once (and only when needed)
+    password_hashes = {password: hash_password(password) for password in {user['password'] for user in missing}}
+    now = datetime.utcnow()
+    for user in missing:
+        user['password'] = password_hashes[user['password']]
+        user['createdAt'] = now
+        user['updatedAt'] = now
+    inserted = missing
+    try:
+        db.users.insert_many(missing, ordered=False)
+    except BulkWriteError as e:
+        # Some were created concurrently by another worker; the rest were still inserted
+        failed = {error['index'] for error in e.details.get('writeErrors', [])}
+        inserted = [user for i, user in enumerate(missing) if i not in failed]
+        print(f"  Note: {len(failed)} demo user(s) already existed ({e.details.get('nInserted', 0)} inserted)")
+    invalidate_doctor_recipients()
+    for user in inserted:
+        print(f"✓ Created demo user: {user['email']}")
@@ -0,0 +1,30 @@
+"""
+Gunicorn configuration for production deployments
+
+Run with: gunicorn -c gunicorn_conf.py app:app
+"""
+import os
+import multiprocessing
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Requests mostly wait on Gemini/Twilio/MongoDB, so use threaded workers. Blocked threads
+# are cheap while waiting on the network, so favour a few processes (each holding its own
+# copy of the dataset) with many threads over many processes with few threads
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() + 1))
+# GUNICORN_WORKER_CLASS=gevent (requires `pip install gevent`) serves each request on a
+# greenlet instead of a thread, so slow OCR/Gemini calls can hold hundreds of requests
+# per worker; gunicorn monkey-patches sockets and subprocess before loading app.py
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class == 'gevent':
+    worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 500))
+    concurrency = worker_connections
+else:
+    threads = int(os.getenv('GUNICORN_THREADS', 32))
+    concurrency = threads
+# app.py sizes its Gemini connection pool from this, so export the effective value
+os.environ.setdefault('GUNICORN_THREADS', str(concurrency))
+
+keepalive = 30
+# Gemini calls can take up to 60s per model before falling back
+timeout = 120
@@ -19,7 +19,7 @@ import { api } from '@/lib/api';
 import { toast } from 'sonner';
 
 interface DoctorRegistration {
-  id: number;
+  id: string;
   name: string;
   email: string;
   licenseNumber: string;
@@ -27,7 +27,7 @@ interface DoctorRegistration {
   hospitalAffiliation?: string;
   phone: string;
   yearsOfExperience: number;
-  licenseCertificate: string;
+  licenseCertificate?: string;
   licenseFileName: string;
   status: 'pending' | 'approved' | 'rejected';
   submittedAt: string;
@@ -18,6 +18,28 @@ async function apiRequest(url: string, options?: RequestInit) {
   }
 }
 
+// Give up polling a background OCR job after this long (the server fails jobs stuck
+// pending for 4 minutes, so this only triggers if the status endpoint stops answering)
+const OCR_POLL_TIMEOUT_MS = 5 * 60 * 1000;
+
+// Large OCR uploads are processed in the background: the server answers 202 with a job id,
+// and this polls until the job's result (the normal OCR response body) is ready
+async function readOcrResponse(response: Response) {
+  if (response.status !== 202) {
+    return response.json();
+  }
+  const { jobId } = await response.json();
+  const deadline = Date.now() + OCR_POLL_TIMEOUT_MS;
+  while (Date.now() < deadline) {
+    await new Promise((resolve) => setTimeout(resolve, 1000));
+    const job = await (await fetch(`${API_BASE_URL}/ocr/status/${jobId}`)).json();
+    if (job.status !== 'pending') {
+      return job.result ?? { success: false, error: job.message || 'OCR job not found' };
+    }
+  }
+  return { success: false, error: 'Image processing timed out. Please try again.' };
+}
+
 export const api = {
   // Auth
   login: async (email: string, password: string, type: 'patient' | 'doctor') => {
@@ -135,9 +157,9 @@ export const api = {
     const response = await fetch(`${API_BASE_URL}/medicines/ocr`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ image: imageBase64 }),
+      body: JSON.stringify({ image: imageBase64, async: true }),
     });
-    return response.json();
+    return readOcrResponse(response);
   },
 
   // Prescription Image OCR
@@ -145,9 +167,9 @@ export const api = {
     const response = await fetch(`${API_BASE_URL}/prescriptions/ocr`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ image: imageBase64 }),
+      body: JSON.stringify({ image: imageBase64, async: true }),
     });
-    return response.json();
+    return readOcrResponse(response);
   },
 
   // Doctor Registration
@@ -201,8 +223,13 @@ export const api = {
     return apiRequest(`${API_BASE_URL}/admin/doctor-registrations`);
   },
 
+  // Admin - Single Doctor Registration (includes license certificate)
+  getDoctorRegistration: async (doctorId: string) => {
+    return apiRequest(`${API_BASE_URL}/admin/doctor-registrations/${doctorId}`);
+  },
+
   // Admin - Review Doctor Registration
-  reviewDoctorRegistration: async (doctorId: number, reviewData: any) => {
+  reviewDoctorRegistration: async (doctorId: string, reviewData: any) => {
     return apiRequest(`${API_BASE_URL}/admin/doctor-registrations/${doctorId}/review`, {
       method: 'PUT',
       headers: { 'Content-Type': 'application/json' },